@@ -0,0 +1,52 @@
+"""
+Бенчмарк пропускной способности аналитических запросов DBManager
+при N одновременно вызывающих потоках, работающих через общий пул соединений.
+
+Запуск (параметры доступа к БД берутся из .env, как в src/main.py):
+    python -m benchmarks.bench_pool --callers 1 2 4 8 --duration 5
+"""
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from src.dbmanager import DBManager
+from src.main import db_config
+
+QUERIES = ('get_companies_and_vacancies_count', 'get_avg_salary', 'get_vacancies_with_higher_salary')
+
+
+def run_caller(db: DBManager, deadline: float) -> int:
+    """Выполняет запросы QUERIES по кругу до наступления deadline, возвращает количество выполненных запросов."""
+    count = 0
+    while time.perf_counter() < deadline:
+        getattr(db, QUERIES[count % len(QUERIES)])()
+        count += 1
+    return count
+
+
+def bench(db: DBManager, callers: int, duration: float) -> float:
+    """Возвращает количество запросов в секунду при callers одновременных вызывающих."""
+    start = time.perf_counter()
+    deadline = start + duration
+    with ThreadPoolExecutor(max_workers=callers) as executor:
+        total = sum(executor.map(run_caller, [db] * callers, [deadline] * callers))
+    return total / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--callers', type=int, nargs='+', default=[1, 2, 4, 8],
+                        help='количество одновременных вызывающих потоков')
+    parser.add_argument('--duration', type=float, default=5.0, help='длительность каждого замера, сек')
+    args = parser.parse_args()
+
+    db = DBManager(db_config, maxconn=max(args.callers))
+    try:
+        for callers in args.callers:
+            print(f"callers={callers:3d}  {bench(db, callers, args.duration):10.1f} queries/s")
+    finally:
+        db.close_conn()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+"""
+Генератор синтетических данных в формате API hh.ru (работодатели и вакансии).
+Данные создаются детерминированно по seed и номеру элемента, без хранения в памяти,
+поэтому объем может быть любым (от тысяч до миллионов вакансий).
+"""
+import random
+from datetime import datetime, timedelta
+from typing import Iterator
+
+SEED = 42
+EMPLOYER_ID_START = 1000000  # id работодателей: EMPLOYER_ID_START + номер работодателя
+VACANCY_ID_STEP = 10000000  # id вакансий: (номер работодателя + 1) * VACANCY_ID_STEP + номер вакансии
+PUBLISHED_FROM = datetime(2024, 1, 1)
+PUBLISHED_DAYS = 365
+
+AREAS = ('Москва', 'Санкт-Петербург', 'Казань', 'Новосибирск', 'Екатеринбург', 'Нижний Новгород', 'Алматы')
+CURRENCIES = ('RUR', 'RUR', 'RUR', 'RUR', 'USD', 'EUR', 'KZT')
+SCHEDULES = ('Полный день', 'Сменный график', 'Гибкий график', 'Удаленная работа')
+EXPERIENCES = ('Нет опыта', 'От 1 года до 3 лет', 'От 3 до 6 лет', 'Более 6 лет')
+EMPLOYMENTS = ('Полная занятость', 'Частичная занятость', 'Стажировка')
+ROLES = ('Продавец-консультант, продавец-кассир', 'Программист, разработчик', 'Водитель',
+         'Менеджер по продажам, менеджер по работе с клиентами', "Оператор call-центра, специалист контакт-центра")
+TITLES = ('Продавец-кассир', 'Python-разработчик', 'Водитель-курьер', 'Менеджер по продажам',
+          'Оператор call-центра', 'Backend developer (Go)', "Кладовщик в магазин O'STIN")
+REQUIREMENTS = ('Опыт работы с Python и PostgreSQL.', 'Грамотная речь, ответственность.',
+                'Водительское удостоверение категории B.', 'Знание английского языка на уровне B2.', None)
+RESPONSIBILITIES = ('Обслуживание покупателей на кассе.', 'Разработка и поддержка backend-сервисов.',
+                    'Доставка заказов клиентам.', 'Поиск и привлечение новых клиентов.', None)
+
+
+def employer_hh_id(employer_index: int) -> int:
+    return EMPLOYER_ID_START + employer_index
+
+
+def generate_employer(employer_index: int, vacancies_count: int, base_url: str = 'https://api.hh.ru') -> dict:
+    """Работодатель в формате ответа https://api.hh.ru/employers"""
+    employer_id = employer_hh_id(employer_index)
+    return {
+        "id": str(employer_id),
+        "name": f"Работодатель {employer_index}",
+        "url": f"{base_url}/employers/{employer_id}",
+        "alternate_url": f"https://hh.ru/employer/{employer_id}",
+        "logo_urls": None,
+        "vacancies_url": f"{base_url}/vacancies?employer_id={employer_id}",
+        "open_vacancies": vacancies_count,
+    }
+
+
+def generate_employers(count: int, vacancies_count: int, base_url: str = 'https://api.hh.ru') -> Iterator[dict]:
+    for employer_index in range(count):
+        yield generate_employer(employer_index, vacancies_count, base_url)
+
+
+def generate_vacancy(employer_index: int, vacancy_index: int, seed: int = SEED,
+                     base_url: str = 'https://api.hh.ru') -> dict:
+    """Вакансия в формате элемента ответа https://api.hh.ru/vacancies"""
+    rnd = random.Random(seed * VACANCY_ID_STEP * VACANCY_ID_STEP + employer_index * VACANCY_ID_STEP + vacancy_index)
+    vacancy_id = (employer_index + 1) * VACANCY_ID_STEP + vacancy_index
+    employer_id = employer_hh_id(employer_index)
+    published_at = PUBLISHED_FROM + timedelta(seconds=rnd.randrange(PUBLISHED_DAYS * 24 * 3600))
+    salary = None
+    if rnd.random() < 0.7:
+        salary_from = rnd.choice((None, rnd.randrange(20, 300) * 1000))
+        salary_to = rnd.choice((None, rnd.randrange(30, 500) * 1000))
+        salary = {"from": salary_from if salary_from or salary_to else 30000, "to": salary_to,
+                  "currency": rnd.choice(CURRENCIES), "gross": rnd.random() < 0.5}
+    area = rnd.choice(AREAS)
+    return {
+        "id": str(vacancy_id),
+        "premium": False,
+        "name": f"{rnd.choice(TITLES)} {vacancy_index}",
+        "department": None,
+        "has_test": False,
+        "area": {"id": str(AREAS.index(area) + 1), "name": area, "url": f"{base_url}/areas/{AREAS.index(area) + 1}"},
+        "salary": salary,
+        "type": {"id": "open", "name": "Открытая"},
+        "address": {"raw": f"{area}, улица Ленина, {rnd.randrange(1, 200)}"} if rnd.random() < 0.5 else None,
+        "published_at": published_at.strftime('%Y-%m-%dT%H:%M:%S+0300'),
+        "created_at": published_at.strftime('%Y-%m-%dT%H:%M:%S+0300'),
+        "archived": False,
+        "url": f"{base_url}/vacancies/{vacancy_id}?host=hh.ru",
+        "alternate_url": f"https://hh.ru/vacancy/{vacancy_id}",
+        "employer": {"id": str(employer_id), "name": f"Работодатель {employer_index}",
+                     "url": f"{base_url}/employers/{employer_id}", "trusted": True},
+        "snippet": {"requirement": rnd.choice(REQUIREMENTS), "responsibility": rnd.choice(RESPONSIBILITIES)},
+        "schedule": {"id": "schedule", "name": rnd.choice(SCHEDULES)},
+        "professional_roles": [{"id": str(ROLES.index(role) + 1), "name": role}
+                               for role in rnd.sample(ROLES, rnd.randrange(1, 3))],
+        "experience": {"id": "experience", "name": rnd.choice(EXPERIENCES)},
+        "employment": {"id": "employment", "name": rnd.choice(EMPLOYMENTS)},
+    }
+
+
+def generate_vacancies(employer_index: int, count: int, seed: int = SEED, start: int = 0,
+                       base_url: str = 'https://api.hh.ru') -> Iterator[dict]:
+    """Вакансии работодателя с номерами от start до count (не включая)."""
+    for vacancy_index in range(start, count):
+        yield generate_vacancy(employer_index, vacancy_index, seed, base_url)
+
+
+def generate_all_vacancies(employers_count: int, vacancies_per_employer: int, seed: int = SEED) -> Iterator[dict]:
+    for employer_index in range(employers_count):
+        yield from generate_vacancies(employer_index, vacancies_per_employer, seed)
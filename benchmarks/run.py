@@ -0,0 +1,168 @@
+"""
+Набор бенчмарков загрузки и запросов на синтетических данных в формате API hh.ru.
+
+Сценарии:
+    fetch        - загрузка вакансий всех работодателей с локальной заглушки API (HH, iter_pages_concurrently);
+    insert_row   - DBManager.insert_data('vacancies', ..., load_mode='row') на первых --row-limit вакансиях;
+    insert_bulk  - DBManager.insert_data('vacancies', ...) всех сгенерированных вакансий;
+    get_*, iter_all_vacancies - аналитические запросы DBManager на загруженных данных;
+    iter_vacancy_batches, get_salary_stats_local - выгрузка в Arrow и статистика по ней (нужен pyarrow).
+
+Результаты записываются в JSON (--output) для сравнения между версиями.
+Используется отдельная БД (--dbname, по умолчанию curs5_bench), ее таблицы очищаются перед запуском.
+Параметры доступа к PostgreSQL берутся из .env, как в src/main.py.
+
+    python -m benchmarks.run --employers 10 --vacancies-per-employer 1000 --output bench_output.json
+"""
+import argparse
+import json
+import platform
+import statistics
+import subprocess
+import time
+from datetime import datetime, timezone
+from itertools import islice
+
+from benchmarks.generator import SEED, generate_all_vacancies, generate_employers
+from benchmarks.stub_server import StubServer
+from src.dbmanager import DBManager, pyarrow
+from src.main import db_config
+from src.parser import HH, MAX_WORKERS, create_session, iter_pages_concurrently
+
+SCENARIOS = ('fetch', 'insert_row', 'insert_bulk', 'get_companies_and_vacancies_count', 'get_all_vacancies',
+             'iter_all_vacancies', 'get_avg_salary', 'get_salary_stats', 'get_vacancies_with_higher_salary',
+             'get_vacancies_with_keyword', 'iter_vacancy_batches', 'get_salary_stats_local')
+ARROW_SCENARIOS = ('iter_vacancy_batches', 'get_salary_stats_local')
+KEYWORDS = ['python', 'продавец']
+
+
+def measure(name: str, func, repeat: int = 1) -> dict:
+    """Выполняет func repeat раз. func возвращает количество обработанных строк."""
+    runs = []
+    rows = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        rows = func()
+        runs.append(time.perf_counter() - start)
+    result = {"name": name, "rows": rows, "repeat": repeat, "min_seconds": min(runs),
+              "mean_seconds": statistics.mean(runs), "runs": runs,
+              "rows_per_second": rows / min(runs) if rows and min(runs) else None}
+    print(f"{name:40s} {result['min_seconds']:10.4f} s  rows={rows}")
+    return result
+
+
+def git_revision() -> str | None:
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def reset_database(db: DBManager):
+    with db.connection() as conn, conn.cursor() as cur:
+        cur.execute("TRUNCATE vacancies, vacancy_professional_roles, employers, sync_state RESTART IDENTITY CASCADE")
+    db.refresh_stats()
+
+
+def bench_fetch(args) -> int:
+    with StubServer(args.employers, args.vacancies_per_employer, args.seed,
+                    latency=args.latency, error_rate=args.error_rate) as server:
+        session = create_session(args.workers)
+        parsers = [HH(employer['vacancies_url'], {"page": 0, "per_page": 100}, session, backoff_factor=0.01)
+                   for employer in generate_employers(args.employers, args.vacancies_per_employer,
+                                                      server.base_url)]
+        rows = sum(len(data['items']) for _, data in iter_pages_concurrently(parsers, 20, args.workers))
+        session.close()
+    return rows
+
+
+def run(args) -> dict:
+    params = dict(db_config, dbname=args.dbname)
+    db = DBManager(params, maxconn=max(2, args.workers))
+    scenarios = args.scenarios or SCENARIOS
+    results = []
+    total_rows = args.employers * args.vacancies_per_employer
+    try:
+        reset_database(db)
+        db.insert_data('employers', generate_employers(args.employers, args.vacancies_per_employer))
+
+        def insert_row() -> int:
+            row_limit = min(args.row_limit, total_rows)
+            vacancies = generate_all_vacancies(args.employers, args.vacancies_per_employer, args.seed)
+            db.insert_data('vacancies', islice(vacancies, row_limit), load_mode='row')
+            return row_limit
+
+        def insert_bulk() -> int:
+            vacancies = generate_all_vacancies(args.employers, args.vacancies_per_employer, args.seed)
+            db.insert_data('vacancies', vacancies, batch_size=args.batch_size)
+            return total_rows
+
+        if 'fetch' in scenarios:
+            results.append(measure('fetch', lambda: bench_fetch(args)))
+        if 'insert_row' in scenarios:
+            results.append(measure('insert_row', insert_row))
+            with db.connection() as conn, conn.cursor() as cur:
+                cur.execute("TRUNCATE vacancies, vacancy_professional_roles RESTART IDENTITY CASCADE")
+        # запросы выполняются на данных, загруженных пакетной вставкой
+        if pyarrow is None and any(name in ARROW_SCENARIOS for name in scenarios):
+            print(f"pyarrow не установлен, сценарии {ARROW_SCENARIOS} пропущены")
+            scenarios = [name for name in scenarios if name not in ARROW_SCENARIOS]
+        if 'insert_bulk' in scenarios or any(name.startswith(('get_', 'iter_')) for name in scenarios):
+            result = measure('insert_bulk', insert_bulk)
+            if 'insert_bulk' in scenarios:
+                results.append(result)
+
+        queries = {
+            'get_companies_and_vacancies_count': lambda: len(db.get_companies_and_vacancies_count()),
+            'get_all_vacancies': lambda: len(db.get_all_vacancies()),
+            'iter_all_vacancies': lambda: sum(1 for _ in db.iter_all_vacancies()),
+            'get_avg_salary': lambda: len(db.get_avg_salary()),
+            'get_salary_stats': lambda: len(db.get_salary_stats(by_area=True, by_experience=True)),
+            'get_vacancies_with_higher_salary': lambda: len(db.get_vacancies_with_higher_salary()),
+            'get_vacancies_with_keyword': lambda: len(db.get_vacancies_with_keyword(KEYWORDS)),
+            'iter_vacancy_batches': lambda: sum(batch.num_rows for batch in db.iter_vacancy_batches()),
+            'get_salary_stats_local': lambda: len(db.get_salary_stats_local(by_area=True, by_experience=True)),
+        }
+        for name, func in queries.items():
+            if name in scenarios:
+                results.append(measure(name, func, args.repeat))
+    finally:
+        db.close_conn()
+
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "git_revision": git_revision(),
+        "python": platform.python_version(),
+        "parameters": {"employers": args.employers, "vacancies_per_employer": args.vacancies_per_employer,
+                       "seed": args.seed, "workers": args.workers, "batch_size": args.batch_size,
+                       "row_limit": args.row_limit, "repeat": args.repeat, "latency": args.latency,
+                       "error_rate": args.error_rate},
+        "scenarios": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--employers', type=int, default=10)
+    parser.add_argument('--vacancies-per-employer', type=int, default=1000)
+    parser.add_argument('--seed', type=int, default=SEED)
+    parser.add_argument('--scenarios', nargs='+', choices=SCENARIOS, help='по умолчанию - все сценарии')
+    parser.add_argument('--repeat', type=int, default=3, help='количество повторов каждого запроса')
+    parser.add_argument('--workers', type=int, default=MAX_WORKERS, help='одновременных запросов к API')
+    parser.add_argument('--batch-size', type=int, default=1000, help='размер пакета при пакетной вставке')
+    parser.add_argument('--row-limit', type=int, default=2000, help='вакансий в сценарии insert_row')
+    parser.add_argument('--latency', type=float, default=0.0, help='задержка ответа заглушки API, сек')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='доля ответов 429 заглушки API')
+    parser.add_argument('--dbname', default='curs5_bench')
+    parser.add_argument('--output', default='bench_output.json')
+    args = parser.parse_args()
+
+    report = run(args)
+    with open(args.output, 'w', encoding='utf-8') as file:
+        json.dump(report, file, ensure_ascii=False, indent=2, default=str)
+    print(f"Результаты записаны в {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,224 @@
+"""
+Локальный HTTP-сервер, имитирующий API hh.ru (/employers и /vacancies) на синтетических данных
+из benchmarks.generator. Поддерживает параметры page, per_page, employer_id, date_from и date_to,
+ограничение API в 2000 элементов на запрос, задержку ответа, ответы 429 и условные запросы (ETag).
+
+Запуск отдельно:
+    python -m benchmarks.stub_server --employers 10 --vacancies-per-employer 5000 --port 8000
+"""
+import argparse
+import hashlib
+import json
+import math
+import random
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from benchmarks.generator import SEED, EMPLOYER_ID_START, generate_employer, generate_vacancy
+
+API_ITEMS_LIMIT = 2000  # API hh.ru отдает не более 2000 элементов по одному запросу
+DEFAULT_PER_PAGE = 20
+
+
+class StubServer:
+    """
+    Сервер-заглушка API hh.ru. Используется как контекстный менеджер:
+        with StubServer(10, 5000) as server:
+            HH(server.vacancies_url, params)...
+    latency - задержка каждого ответа (сек), error_rate - доля ответов 429 Too Many Requests,
+    errors_first - количество первых запросов, на которые отвечается 429, retry_after - значение
+    заголовка Retry-After (сек) в ответах 429.
+    Ответы содержат ETag, на запрос с совпадающим If-None-Match отвечается 304 Not Modified.
+    Счетчики: requests_count - обработанные запросы, not_modified_count - ответы 304,
+    max_in_flight - наибольшее число одновременно обрабатываемых запросов.
+    """
+
+    def __init__(self, employers_count: int, vacancies_per_employer: int, seed: int = SEED,
+                 host: str = '127.0.0.1', port: int = 0, latency: float = 0.0, error_rate: float = 0.0,
+                 errors_first: int = 0, retry_after: int = 0):
+        self.employers_count = employers_count
+        self.vacancies_per_employer = vacancies_per_employer
+        self.seed = seed
+        self.latency = latency
+        self.error_rate = error_rate
+        self.errors_first = errors_first
+        self.retry_after = retry_after
+        self.requests_count = 0
+        self.not_modified_count = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.__lock = threading.Lock()
+        self.__published = {}  # номер работодателя -> даты публикации его вакансий (для фильтра по дате)
+        self.__server = ThreadingHTTPServer((host, port), self._handler_class())
+        self.__server.daemon_threads = True
+        self.__thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.__server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def employers_url(self) -> str:
+        return f"{self.base_url}/employers"
+
+    @property
+    def vacancies_url(self) -> str:
+        return f"{self.base_url}/vacancies"
+
+    def start(self):
+        self.__thread = threading.Thread(target=self.__server.serve_forever, daemon=True)
+        self.__thread.start()
+
+    def stop(self):
+        self.__server.shutdown()
+        self.__server.server_close()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    def _start_request(self) -> int:
+        """Учитывает начало обработки запроса и возвращает его порядковый номер (с 1)."""
+        with self.__lock:
+            self.requests_count += 1
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            return self.requests_count
+
+    def _finish_request(self):
+        with self.__lock:
+            self.in_flight -= 1
+
+    def _count_not_modified(self):
+        with self.__lock:
+            self.not_modified_count += 1
+
+    def _employers(self, page: int, per_page: int) -> dict:
+        found = self.employers_count
+        items = [generate_employer(index, self.vacancies_per_employer, self.base_url)
+                 for index in range(page * per_page, min((page + 1) * per_page, found))]
+        return self._page(items, found, page, per_page)
+
+    def _published(self, employer_index: int) -> list[datetime]:
+        """Даты публикации вакансий работодателя, вычисляются один раз."""
+        with self.__lock:
+            published = self.__published.get(employer_index)
+        if published is None:
+            published = [datetime.strptime(generate_vacancy(employer_index, number, self.seed, self.base_url)
+                                           ['published_at'], '%Y-%m-%dT%H:%M:%S%z')
+                         for number in range(self.vacancies_per_employer)]
+            with self.__lock:
+                self.__published[employer_index] = published
+        return published
+
+    def _vacancies(self, page: int, per_page: int, employer_id: str | None, date_from: str | None,
+                   date_to: str | None) -> dict:
+        if employer_id is not None:
+            employer_index = int(employer_id) - EMPLOYER_ID_START
+            employers = [employer_index] if 0 <= employer_index < self.employers_count else []
+        else:
+            employers = range(self.employers_count)
+        if date_from is not None or date_to is not None:
+            # фильтр по дате требует перебора дат публикации всех вакансий - для заглушки это допустимо
+            since = datetime.fromisoformat(date_from) if date_from is not None else None
+            until = datetime.fromisoformat(date_to) if date_to is not None else None
+            matched = [(index, number) for index in employers
+                       for number, published_at in enumerate(self._published(index))
+                       if (since is None or published_at >= since) and (until is None or published_at <= until)]
+            items = [generate_vacancy(index, number, self.seed, self.base_url) for index, number in
+                     matched[page * per_page:min((page + 1) * per_page, API_ITEMS_LIMIT)]]
+            return self._page(items, len(matched), page, per_page)
+        found = len(employers) * self.vacancies_per_employer
+        positions = range(page * per_page, min((page + 1) * per_page, found, API_ITEMS_LIMIT))
+        items = [generate_vacancy(employers[position // self.vacancies_per_employer],
+                                  position % self.vacancies_per_employer, self.seed, self.base_url)
+                 for position in positions]
+        return self._page(items, found, page, per_page)
+
+    @staticmethod
+    def _page(items: list[dict], found: int, page: int, per_page: int) -> dict:
+        pages = math.ceil(min(found, API_ITEMS_LIMIT) / per_page)
+        return {"items": items, "found": found, "pages": pages, "page": page, "per_page": per_page}
+
+    def _handler_class(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def _send(self, status: int, body: bytes = b'', etag: str = None):
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                if status == 429:
+                    self.send_header('Retry-After', str(stub.retry_after))
+                if etag is not None:
+                    self.send_header('ETag', etag)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                number = stub._start_request()
+                try:
+                    self._get(number)
+                finally:
+                    stub._finish_request()
+
+            def _get(self, number: int):
+                if stub.latency:
+                    time.sleep(stub.latency)
+                if number <= stub.errors_first or stub.error_rate and random.random() < stub.error_rate:
+                    self._send(429)
+                    return
+                url = urlparse(self.path)
+                query = {key: values[0] for key, values in parse_qs(url.query).items()}
+                page = int(query.get('page', 0))
+                per_page = int(query.get('per_page', DEFAULT_PER_PAGE))
+                if url.path == '/employers':
+                    data = stub._employers(page, per_page)
+                elif url.path == '/vacancies':
+                    data = stub._vacancies(page, per_page, query.get('employer_id'), query.get('date_from'),
+                                           query.get('date_to'))
+                else:
+                    self._send(404, json.dumps({"errors": [{"type": "not_found"}]}).encode())
+                    return
+                body = json.dumps(data, ensure_ascii=False).encode()
+                etag = f'"{hashlib.md5(body).hexdigest()}"'
+                if self.headers.get('If-None-Match') == etag:
+                    stub._count_not_modified()
+                    self._send(304, etag=etag)
+                    return
+                self._send(200, body, etag)
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--employers', type=int, default=10)
+    parser.add_argument('--vacancies-per-employer', type=int, default=2000)
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--latency', type=float, default=0.0)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    args = parser.parse_args()
+    server = StubServer(args.employers, args.vacancies_per_employer, port=args.port,
+                        latency=args.latency, error_rate=args.error_rate)
+    print(f"API hh.ru: {server.base_url}/employers, {server.base_url}/vacancies")
+    server.start()
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,150 @@
+import multiprocessing
+import os
+import socket
+import time
+from datetime import datetime, timedelta, timezone
+from itertools import chain
+
+from src.dbmanager import DBManager, CrawlTask
+from src.my_exeption import RequestErrorException
+from src.parser import HH, create_session, iter_pages_concurrently
+from src.sync import PER_PAGE, PAGES_MAX, parse_published_at
+
+CRAWL_WORKERS = 4  # количество процессов-обработчиков очереди
+THREADS_PER_WORKER = 2  # одновременных запросов страниц внутри одного процесса
+API_ITEMS_LIMIT = PER_PAGE * PAGES_MAX  # API hh.ru отдает не более 2000 элементов по одному запросу
+CRAWL_PERIOD_DAYS = 30  # окно дат публикации, которое делится на части, если вакансий больше API_ITEMS_LIMIT
+MIN_WINDOW = timedelta(minutes=1)  # окно дат меньше этого не делится, загружаются первые API_ITEMS_LIMIT вакансий
+LEASE_SECONDS = 600  # задача, выполняемая дольше, считается брошенной и выдается другому обработчику
+MAX_ATTEMPTS = 3  # после стольких неудачных попыток задача отмечается 'failed'
+POLL_INTERVAL = 1.0  # пауза (сек) обработчика, когда свободных задач нет, но другие задачи еще выполняются
+
+
+def format_date(value: datetime) -> str:
+    return value.isoformat(timespec='seconds')
+
+
+def split_task(params: dict, now: datetime, period_days: int = CRAWL_PERIOD_DAYS) -> list[dict] | None:
+    """
+    Делит запрос вакансий работодателя на два по окну дат публикации (date_from, date_to).
+    Запрос без начала окна (date_from) заменяется двумя запросами за последние period_days дней
+    до date_to (или до now) и третьим запросом вакансий, опубликованных раньше, - он тоже без date_from
+    и при необходимости делится так же, поэтому старые вакансии не теряются.
+    Возвращает параметры новых запросов или None, если окно уже меньше 2 * MIN_WINDOW.
+    """
+    date_to = parse_published_at(params['date_to']) if 'date_to' in params else now
+    older = []
+    if 'date_from' in params:
+        date_from = parse_published_at(params['date_from'])
+    else:
+        date_from = date_to - timedelta(days=period_days)
+        older = [{**params, 'date_to': format_date(date_from - timedelta(seconds=1))}]
+    if date_to - date_from < 2 * MIN_WINDOW:
+        return None
+    middle = date_from + (date_to - date_from) / 2
+    middle = middle.replace(microsecond=0)
+    return [{**params, 'date_from': format_date(date_from), 'date_to': format_date(middle)},
+            {**params, 'date_from': format_date(middle + timedelta(seconds=1)), 'date_to': format_date(date_to)},
+            *older]
+
+
+def process_task(db: DBManager, task: CrawlTask, parser: HH, threads: int = THREADS_PER_WORKER,
+                 period_days: int = CRAWL_PERIOD_DAYS) -> tuple[str, int, int]:
+    """
+    Выполняет задачу очереди: запрашивает первую страницу вакансий, и если найдено больше,
+    чем API отдает по одному запросу, ставит в очередь задачи с более узкими окнами дат (см. split_task).
+    Иначе загружает все страницы и вносит вакансии в БД в режиме 'upsert'.
+    Возвращает (статус задачи, найдено, загружено).
+    """
+    pages = iter_pages_concurrently([parser], PAGES_MAX, threads)
+    _, first = next(pages)
+    if first['found'] > API_ITEMS_LIMIT:
+        children = split_task(task.params, datetime.now(timezone.utc), period_days)
+        if children is not None:
+            pages.close()
+            db.enqueue_crawl_tasks((task.employer_hh_id, params) for params in children)
+            return 'split', first['found'], 0
+        print(f"Работодатель {task.employer_hh_id}, {task.params}: найдено {first['found']} вакансий, "
+              f"окно дат делить дальше нельзя, загружаются первые {API_ITEMS_LIMIT}")
+
+    loaded = 0
+
+    def items():
+        nonlocal loaded
+        for data in chain([first], (data for _, data in pages)):
+            loaded += len(data['items'])
+            yield from data['items']
+
+    db.insert_data('vacancies', items(), load_mode='upsert', refresh=False)
+    return 'done', first['found'], loaded
+
+
+def crawl_worker(db_params: dict, vacancies_url: str, threads: int = THREADS_PER_WORKER,
+                 period_days: int = CRAWL_PERIOD_DAYS, lease: float = LEASE_SECONDS,
+                 max_attempts: int = MAX_ATTEMPTS):
+    """
+    Обработчик очереди crawl_queue, выполняется в отдельном процессе со своим соединением с БД
+    и своим пулом HTTP-соединений. Берет задачи, пока в очереди есть свободные или выполняемые
+    другими обработчиками задачи (выполняемые задачи могут добавить новые при делении).
+    """
+    worker = f"{socket.gethostname()}:{os.getpid()}"
+    db = DBManager(db_params, maxconn=2)
+    session = create_session(threads)
+    done = 0
+    try:
+        while True:
+            task = db.claim_crawl_task(worker, lease)
+            if task is None:
+                if db.get_crawl_status()['running'] == 0:
+                    break
+                time.sleep(POLL_INTERVAL)
+                continue
+            params = {**task.params, "page": 0, "per_page": PER_PAGE}
+            try:
+                status, found, loaded = process_task(db, task, HH(vacancies_url, params, session),
+                                                     threads, period_days)
+            except (RequestErrorException, KeyError, ValueError) as e:
+                print(f"Обработчик {worker}, задача {task.task_id}: ", e)
+                db.finish_crawl_task(task.task_id, 'failed' if task.attempts >= max_attempts else 'pending',
+                                     error=str(e))
+            else:
+                db.finish_crawl_task(task.task_id, status, found, loaded)
+                done += 1
+    finally:
+        session.close()
+        db.close_conn()
+    print(f"Обработчик {worker}: выполнено задач {done}")
+
+
+def run_crawl(db_params: dict, employers: list[dict], vacancies_url: str, workers: int = CRAWL_WORKERS,
+              threads: int = THREADS_PER_WORKER, resume: bool = False,
+              period_days: int = CRAWL_PERIOD_DAYS) -> dict:
+    """
+    Загрузка вакансий работодателей employers несколькими процессами через очередь crawl_queue.
+    Для каждого работодателя ставится задача; задачи с результатом больше 2000 вакансий
+    делятся по окну дат публикации, пока каждая не уложится в ограничение API.
+    Очередь хранится в БД, поэтому при resume=True прерванный обход продолжается
+    с невыполненных задач, иначе очередь очищается и обход начинается заново.
+    Работодатели employers должны быть уже внесены в БД (insert_data('employers', ...)),
+    иначе их вакансии не будут загружены.
+    Процессы запускаются через spawn, каждый открывает собственные соединения с БД и API.
+    После обхода пересчитывается статистика. Возвращает get_crawl_status().
+    """
+    db = DBManager(db_params)
+    try:
+        if not resume:
+            db.reset_crawl_queue()
+        db.enqueue_crawl_tasks((int(employer['id']), {"employer_id": employer['id']}) for employer in employers)
+
+        context = multiprocessing.get_context('spawn')
+        processes = [context.Process(target=crawl_worker, args=(db_params, vacancies_url, threads, period_days))
+                     for _ in range(workers)]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+
+        db.refresh_stats()
+        return db.get_crawl_status()
+    finally:
+        db.close_conn()
@@ -1,17 +1,504 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+from functools import wraps
+from itertools import count, islice
+from typing import Iterable, Iterator
+
 import psycopg2
+import psycopg2.extensions
+from psycopg2.extras import execute_values
+from psycopg2.pool import ThreadedConnectionPool
+
+from src.metrics import Metrics, default_metrics
+
+# pyarrow нужен только для выгрузки вакансий в Arrow/Parquet и локальной статистики зарплат
+try:
+    import pyarrow
+    import pyarrow.compute
+    import pyarrow.csv
+    import pyarrow.ipc
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+# Режимы загрузки вакансий в insert_data:
+# 'row' - построчная вставка с проверкой дубля отдельным запросом, каждая строка фиксируется отдельно,
+# 'bulk' - пакетная вставка одним запросом с ON CONFLICT по vacancy_hh_id,
+# 'upsert' - пакетная вставка, при которой существующие вакансии обновляются, если их данные изменились
+LOAD_MODES = ('row', 'bulk', 'upsert')
+BATCH_SIZE = 1000  # количество вакансий в одном пакете при пакетной вставке
+POOL_MINCONN = 1  # минимальное количество соединений в пуле
+POOL_MAXCONN = 10  # максимальное количество соединений в пуле
+ITERSIZE = 2000  # количество строк, получаемых с сервера за один раз при потоковом чтении
+PREPARED_STATEMENTS_MAX = 256  # подготовленных запросов на одно соединение, давно не использованные удаляются
+
+# Компактная запись о вакансии для потокового чтения (iter_all_vacancies) вместо словаря на каждую строку
+VacancyRecord = namedtuple('VacancyRecord', ['vacancies_id', 'vacancies_name', 'employers_name', 'salary_from',
+                                             'salary_to', 'currency', 'gross', 'vacancies_alternate_url'])
+
+# Задача очереди обхода вакансий (таблица crawl_queue): params - параметры запроса к API hh.ru
+CrawlTask = namedtuple('CrawlTask', ['task_id', 'employer_hh_id', 'params', 'attempts'])
+CRAWL_STATUSES = ('pending', 'running', 'done', 'split', 'failed')
+
+# Секции таблицы vacancies при секционированной схеме: по месяцу published_at, имя vacancies_ГГГГ_ММ
+PARTITION_NAME_RE = re.compile(r'^vacancies_(\d{4})_(\d{2})$')
+
+# Колонки выгрузки вакансий в Arrow/Parquet: имя колонки -> (выражение SQL, тип Arrow)
+EXPORT_COLUMNS = {
+    'vacancies_id': ('vacancies.vacancies_id', 'int32'),
+    'vacancy_hh_id': ('vacancies.vacancy_hh_id', 'int32'),
+    'employer_hh_id': ('employers.employer_hh_id', 'int32'),
+    'vacancies_name': ('vacancies.name', 'string'),
+    'employers_name': ('employers.name', 'string'),
+    'area': ('vacancies.area', 'string'),
+    'salary_from': ('vacancies.salary_from', 'int32'),
+    'salary_to': ('vacancies.salary_to', 'int32'),
+    'currency': ('vacancies.currency', 'string'),
+    'gross': ('vacancies.gross', 'bool'),
+    'type': ('vacancies.type', 'string'),
+    'address': ('vacancies.address', 'string'),
+    'published_at': ('vacancies.published_at', 'date32'),
+    'created_at': ('vacancies.created_at', 'date32'),
+    'vacancies_alternate_url': ('vacancies.alternate_url', 'string'),
+    'snippet_requirement': ('vacancies.snippet_requirement', 'string'),
+    'snippet_responsibility': ('vacancies.snippet_responsibility', 'string'),
+    'schedule': ('vacancies.schedule', 'string'),
+    'professional_roles': ('vacancies.professional_roles', 'string'),
+    'experience': ('vacancies.experience', 'string'),
+    'employment': ('vacancies.employment', 'string'),
+}
+EXPORT_FORMATS = ('parquet', 'arrow')
+EXPORT_BLOCK_SIZE = 4 << 20  # объем CSV (байт), разбираемый в одну порцию (RecordBatch) при выгрузке
+
+# Конфигурации полнотекстового поиска: названия вакансий и описания бывают на русском и на английском
+SEARCH_CONFIGS = ('russian', 'english')
+
+
+def search_vector_sql(name: str, roles: str, requirement: str, responsibility: str) -> str:
+    """
+    Выражение поискового вектора вакансии по выражениям SQL для названия (вес A),
+    профессиональных ролей (вес B) и описания - требований и обязанностей (вес C).
+    """
+    return " || ".join(
+        f"setweight(to_tsvector('{config}', coalesce({name}, '')), 'A') || "
+        f"setweight(to_tsvector('{config}', coalesce({roles}, '')), 'B') || "
+        f"setweight(to_tsvector('{config}', coalesce({requirement}, '') || ' ' || "
+        f"coalesce({responsibility}, '')), 'C')"
+        for config in SEARCH_CONFIGS)
+
+
+# Поисковый вектор по колонкам исходной (ненормализованной) таблицы vacancies
+SEARCH_VECTOR_SQL = search_vector_sql('name', 'professional_roles', 'snippet_requirement', 'snippet_responsibility')
+
+# Справочники повторяющихся значений вакансий: колонка vacancies -> (таблица справочника, тип ключа).
+# В vacancies хранится ключ справочника в колонке <колонка>_id.
+VACANCY_DIMENSIONS = {
+    'area': ('areas', 'INT'),
+    'type': ('vacancy_types', 'SMALLINT'),
+    'currency': ('currencies', 'SMALLINT'),
+    'schedule': ('schedules', 'SMALLINT'),
+    'experience': ('experiences', 'SMALLINT'),
+    'employment': ('employments', 'SMALLINT'),
+}
+# Профессиональные роли - справочник professional_roles и связь многие-ко-многим vacancy_professional_roles
+ROLES_DIMENSION = 'professional_roles'
+ROLES_TABLE = 'professional_roles'
+# Справочники, значения которых добавляются при загрузке: значение VACANCY_VALUES -> таблица справочника
+DIMENSION_TABLES = {**{column: table for column, (table, _) in VACANCY_DIMENSIONS.items()},
+                    ROLES_DIMENSION: ROLES_TABLE}
+
+# Вакансии со значениями из справочников в прежних колонках (area, currency, ..., professional_roles -
+# первая профессиональная роль). Подставляется в запросы вместо таблицы vacancies, поэтому запросы
+# и результат методов get_* не зависят от нормализации. Неиспользуемые в запросе справочники
+# PostgreSQL не соединяет (LEFT JOIN по первичному ключу удаляется планировщиком).
+VACANCIES_SQL = (
+    "(SELECT vacancies.*, "
+    + "".join(f"{column}_dim.name AS {column}, " for column in VACANCY_DIMENSIONS)
+    + f"(SELECT {ROLES_TABLE}.name FROM vacancy_professional_roles "
+      f"JOIN {ROLES_TABLE} ON {ROLES_TABLE}.id = vacancy_professional_roles.role_id "
+      f"WHERE vacancy_professional_roles.vacancy_hh_id = vacancies.vacancy_hh_id "
+      f"ORDER BY vacancy_professional_roles.position LIMIT 1) AS professional_roles "
+      f"FROM vacancies "
+    + "".join(f"LEFT JOIN {table} AS {column}_dim ON {column}_dim.id = vacancies.{column}_id "
+              for column, (table, _) in VACANCY_DIMENSIONS.items())
+    + ") AS vacancies")
+
+
+def salary_stats_sql(group_by: tuple, condition: str = None, source: str = VACANCIES_SQL) -> str:
+    """
+    Запрос агрегатов по зарплатам вакансий в разрезе колонок group_by: количество вакансий,
+    суммы, количества и средние значения salary_from/salary_to, квартили и медианы.
+    condition - дополнительное условие отбора вакансий (например, по дате публикации),
+    source - таблица или подзапрос с вакансиями.
+    """
+    columns = ", ".join(group_by)
+    aggregates = ", ".join(
+        f"SUM({salary}) AS sum_{salary}, COUNT({salary}) AS count_{salary}, AVG({salary}) AS avg_{salary}, "
+        f"percentile_cont(0.25) WITHIN GROUP (ORDER BY {salary}) AS p25_{salary}, "
+        f"percentile_cont(0.5) WITHIN GROUP (ORDER BY {salary}) AS median_{salary}, "
+        f"percentile_cont(0.75) WITHIN GROUP (ORDER BY {salary}) AS p75_{salary}"
+        for salary in ('salary_from', 'salary_to'))
+    where = "salary_from IS NOT NULL OR salary_to IS NOT NULL"
+    if condition:
+        where = f"({where}) AND {condition}"
+    return (f"SELECT {columns}, COUNT(*) AS vacancies_count, {aggregates} FROM {source} "
+            f"WHERE {where} "
+            f"GROUP BY {columns}")
+
+
+def employer_vacancy_counts_sql(condition: str = None, source: str = VACANCIES_SQL) -> str:
+    """Запрос количества вакансий каждой компании; condition - дополнительное условие отбора вакансий."""
+    where = f"WHERE {condition} " if condition else ""
+    return ("SELECT employer_id, employers.name AS employers_name, COUNT(*) AS vacancies_count "
+            f"FROM employers JOIN {source} USING (employer_id) {where}GROUP BY employer_id")
+
+
+def date_range_condition(date_from: date = None, date_to: date = None) -> tuple[str | None, tuple]:
+    """
+    Условие отбора вакансий по дате публикации (границы включительно) и его параметры.
+    По условию на published_at PostgreSQL просматривает только нужные секции таблицы vacancies.
+    """
+    conditions, params = [], []
+    if date_from is not None:
+        conditions.append("vacancies.published_at >= %s")
+        params.append(date_from)
+    if date_to is not None:
+        conditions.append("vacancies.published_at <= %s")
+        params.append(date_to)
+    return " AND ".join(conditions) or None, tuple(params)
+
+
+def require_pyarrow():
+    if pyarrow is None:
+        raise ImportError("Для выгрузки в Arrow/Parquet необходимо установить pyarrow: pip install pyarrow")
+
+
+def export_schema(columns: Iterable[str]) -> 'pyarrow.Schema':
+    """Схема Arrow для колонок выгрузки columns (см. EXPORT_COLUMNS)."""
+    unknown = set(columns) - set(EXPORT_COLUMNS)
+    if unknown:
+        raise ValueError(f"Неизвестные колонки выгрузки: {sorted(unknown)}. Допустимые колонки: {list(EXPORT_COLUMNS)}")
+    return pyarrow.schema([(column, pyarrow.type_for_alias(EXPORT_COLUMNS[column][1])) for column in columns])
+
+
+def month_start(value: date) -> date:
+    return value.replace(day=1)
+
+
+def next_month(value: date) -> date:
+    return date(value.year + value.month // 12, value.month % 12 + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    return f"vacancies_{month.year}_{month.month:02d}"
+
+
+# Представления со статистикой зарплат: разрез (колонки группировки) -> имя представления.
+# Медианы и квартили нельзя получить из более детального разреза, поэтому каждый разрез предрассчитан отдельно.
+SALARY_STATS_VIEWS = {
+    ('currency', 'gross'): 'salary_stats',
+    ('currency', 'gross', 'area'): 'salary_stats_by_area',
+    ('currency', 'gross', 'experience'): 'salary_stats_by_experience',
+    ('currency', 'gross', 'area', 'experience'): 'salary_stats_by_area_experience',
+}
+
+
+def stats_views(source: str = VACANCIES_SQL) -> tuple:
+    """
+    Материализованные представления с агрегатами для аналитических запросов: (имя, запрос, уникальный ключ).
+    Уникальный ключ нужен для обновления без блокировки чтения (REFRESH MATERIALIZED VIEW CONCURRENTLY).
+    """
+    return tuple((name, salary_stats_sql(group_by, source=source), group_by)
+                 for group_by, name in SALARY_STATS_VIEWS.items()) + (
+        ('employer_vacancy_counts', employer_vacancy_counts_sql(source=source), ('employer_id',)),
+    )
+
+
+STATS_VIEWS = stats_views()
+
+
+def create_stats_views_sql(source: str = VACANCIES_SQL) -> tuple:
+    """Команды создания представлений stats_views(source) с уникальными индексами."""
+    return tuple(statement for name, query, key in stats_views(source) for statement in (
+        f"CREATE MATERIALIZED VIEW IF NOT EXISTS {name} AS {query}",
+        f"CREATE UNIQUE INDEX IF NOT EXISTS {name}_key ON {name} ({', '.join(key)})",
+    ))
+
+
+# Версионные миграции схемы БД: (версия, описание, SQL-команды).
+# Применяются по порядку методом migrate(), примененные версии хранятся в таблице schema_migrations.
+# Новые изменения схемы добавляются в конец списка со следующим номером версии.
+MIGRATIONS = (
+    (1, "уникальный ключ vacancies.vacancy_hh_id", (
+        # перед созданием уникального индекса удаляем накопившиеся дубли, оставляя первую загруженную запись
+        "DELETE FROM vacancies a USING vacancies b "
+        "WHERE a.vacancy_hh_id = b.vacancy_hh_id AND a.vacancies_id > b.vacancies_id",
+        "CREATE UNIQUE INDEX IF NOT EXISTS vacancies_vacancy_hh_id_key ON vacancies (vacancy_hh_id)",
+    )),
+    (2, "индекс по внешнему ключу vacancies.employer_id", (
+        "CREATE INDEX IF NOT EXISTS vacancies_employer_id_idx ON vacancies (employer_id)",
+    )),
+    (3, "частичный индекс (currency, gross) по вакансиям с зарплатой", (
+        "CREATE INDEX IF NOT EXISTS vacancies_currency_gross_idx ON vacancies (currency, gross) "
+        "INCLUDE (salary_from, salary_to) WHERE salary_from IS NOT NULL OR salary_to IS NOT NULL",
+    )),
+    (4, "полнотекстовый поиск: колонка search_vector и GIN-индекс", (
+        f"ALTER TABLE vacancies ADD COLUMN IF NOT EXISTS search_vector tsvector "
+        f"GENERATED ALWAYS AS ({SEARCH_VECTOR_SQL}) STORED",
+        "CREATE INDEX IF NOT EXISTS vacancies_search_vector_idx ON vacancies USING GIN (search_vector)",
+    )),
+    (5, "инкрементальная синхронизация: таблица sync_state и колонка vacancies.closed_at", (
+        "CREATE TABLE IF NOT EXISTS sync_state ("
+        "employer_id INT PRIMARY KEY REFERENCES employers(employer_id), "
+        "last_published_at TIMESTAMPTZ, "
+        "last_synced_at TIMESTAMPTZ NOT NULL DEFAULT now())",
+        "ALTER TABLE vacancies ADD COLUMN IF NOT EXISTS closed_at TIMESTAMPTZ",
+    )),
+    # представления миграции 6 построены по исходной таблице, миграция 8 пересоздает их по справочникам
+    (6, "материализованные представления со статистикой зарплат и количеством вакансий",
+     create_stats_views_sql('vacancies')),
+    (7, "очередь задач обхода вакансий crawl_queue", (
+        "CREATE TABLE IF NOT EXISTS crawl_queue ("
+        "task_id SERIAL PRIMARY KEY, "
+        "employer_hh_id INT NOT NULL, "
+        "params JSONB NOT NULL DEFAULT '{}', "
+        "status VARCHAR NOT NULL DEFAULT 'pending', "
+        "attempts INT NOT NULL DEFAULT 0, "
+        "found INT, "
+        "loaded INT, "
+        "worker VARCHAR, "
+        "error TEXT, "
+        "locked_at TIMESTAMPTZ, "
+        "updated_at TIMESTAMPTZ NOT NULL DEFAULT now(), "
+        "UNIQUE (employer_hh_id, params))",
+        "CREATE INDEX IF NOT EXISTS crawl_queue_status_idx ON crawl_queue (status, task_id)",
+    )),
+    (8, "справочники повторяющихся значений и все профессиональные роли вакансий", (
+        *(statement for column, (table, key_type) in VACANCY_DIMENSIONS.items() for statement in (
+            f"CREATE TABLE IF NOT EXISTS {table} ("
+            f"id {key_type} GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY, "
+            f"name VARCHAR NOT NULL UNIQUE)",
+            f"INSERT INTO {table} (name) SELECT DISTINCT {column} FROM vacancies WHERE {column} IS NOT NULL "
+            f"ON CONFLICT (name) DO NOTHING",
+            f"ALTER TABLE vacancies ADD COLUMN IF NOT EXISTS {column}_id {key_type} REFERENCES {table}(id)",
+            f"UPDATE vacancies SET {column}_id = {table}.id FROM {table} WHERE {table}.name = vacancies.{column}",
+        )),
+        f"CREATE TABLE IF NOT EXISTS {ROLES_TABLE} ("
+        f"id SMALLINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY, "
+        f"name VARCHAR NOT NULL UNIQUE)",
+        "CREATE TABLE IF NOT EXISTS vacancy_professional_roles ("
+        "vacancy_hh_id INT NOT NULL, "
+        f"role_id SMALLINT NOT NULL REFERENCES {ROLES_TABLE}(id), "
+        "position SMALLINT NOT NULL, "
+        "PRIMARY KEY (vacancy_hh_id, role_id))",
+        f"INSERT INTO {ROLES_TABLE} (name) SELECT DISTINCT professional_roles FROM vacancies "
+        f"WHERE professional_roles IS NOT NULL ON CONFLICT (name) DO NOTHING",
+        # до нормализации хранилась только первая роль вакансии
+        f"INSERT INTO vacancy_professional_roles (vacancy_hh_id, role_id, position) "
+        f"SELECT DISTINCT vacancies.vacancy_hh_id, {ROLES_TABLE}.id, 0 FROM vacancies "
+        f"JOIN {ROLES_TABLE} ON {ROLES_TABLE}.name = vacancies.professional_roles ON CONFLICT DO NOTHING",
+        # поисковый вектор по всем ролям вакансии вычисляется при загрузке, а не генерируется из колонок
+        *(f"DROP MATERIALIZED VIEW IF EXISTS {name}" for name, _, _ in STATS_VIEWS),
+        "ALTER TABLE vacancies DROP COLUMN search_vector",
+        "ALTER TABLE vacancies ADD COLUMN search_vector tsvector",
+        f"UPDATE vacancies SET search_vector = {SEARCH_VECTOR_SQL}",
+        "CREATE INDEX IF NOT EXISTS vacancies_search_vector_idx ON vacancies USING GIN (search_vector)",
+        "ALTER TABLE vacancies "
+        + ", ".join(f"DROP COLUMN {column}" for column in (*VACANCY_DIMENSIONS, 'professional_roles')),
+        "CREATE INDEX IF NOT EXISTS vacancies_currency_gross_idx ON vacancies (currency_id, gross) "
+        "INCLUDE (salary_from, salary_to) WHERE salary_from IS NOT NULL OR salary_to IS NOT NULL",
+        *create_stats_views_sql(),
+    )),
+)
+
+# Колонки таблицы vacancies, заполняемые при загрузке
+VACANCY_COLUMNS = ('vacancy_hh_id', 'employer_id', 'name', 'area_id', 'salary_from', 'salary_to', 'currency_id',
+                   'gross', 'type_id', 'address', 'published_at', 'created_at', 'url', 'alternate_url',
+                   'snippet_requirement', 'snippet_responsibility', 'schedule_id', 'experience_id', 'employment_id',
+                   'search_vector')
+# Значения вакансии, передаваемые в запрос вставки (VALUES): area, currency и другие колонки справочников
+# содержат ключи справочников, professional_roles - названия всех ролей для поискового вектора
+VACANCY_VALUES = ('vacancy_hh_id', 'employer_hh_id', 'name', 'area', 'salary_from', 'salary_to', 'currency', 'gross',
+                  'type', 'address', 'published_at', 'created_at', 'url', 'alternate_url', 'snippet_requirement',
+                  'snippet_responsibility', 'schedule', 'experience', 'employment', 'professional_roles')
+VACANCY_VALUES_TEMPLATE = ("(%s::int, %s::int, %s, %s::int, %s::int, %s::int, %s::smallint, %s::bool, %s::smallint, "
+                           "%s, %s::date, %s::date, %s, %s, %s, %s, %s::smallint, %s::smallint, %s::smallint, %s)")
+VACANCY_INSERT_SQL = (
+    f"INSERT INTO vacancies ({', '.join(VACANCY_COLUMNS)}) "
+    f"SELECT v.vacancy_hh_id, employers.employer_id, v.name, v.area, v.salary_from, v.salary_to, v.currency, "
+    f"v.gross, v.type, v.address, v.published_at, v.created_at, v.url, v.alternate_url, "
+    f"v.snippet_requirement, v.snippet_responsibility, v.schedule, v.experience, v.employment, "
+    f"{search_vector_sql('v.name', 'v.professional_roles', 'v.snippet_requirement', 'v.snippet_responsibility')} "
+    f"FROM (VALUES %s) AS v ({', '.join(VACANCY_VALUES)}) "
+    f"JOIN employers USING (employer_hh_id) ")
+# Вставка одной вакансии (построчная загрузка): VALUES с одной строкой по шаблону VACANCY_VALUES_TEMPLATE
+VACANCY_INSERT_ROW_SQL = VACANCY_INSERT_SQL % VACANCY_VALUES_TEMPLATE
+# Условие вставки в секционированную таблицу: уникальный ключ секций включает published_at,
+# поэтому вакансия, уже загруженная с другой датой публикации, отсекается отдельной проверкой
+VACANCY_NOT_EXISTS_SQL = "WHERE NOT EXISTS (SELECT 1 FROM vacancies WHERE vacancies.vacancy_hh_id = v.vacancy_hh_id) "
+
+
+# Имя выполняемой операции DBManager в текущем потоке - метка для метрик запросов
+_operation = threading.local()
+
+
+@contextmanager
+def operation_scope(name: str):
+    """Задает имя операции DBManager, к которой относятся запросы, выполняемые внутри блока."""
+    previous = getattr(_operation, 'name', None)
+    _operation.name = name
+    try:
+        yield
+    finally:
+        _operation.name = previous
+
+
+def instrumented(method):
+    """Декоратор методов DBManager: измеряет время операции и помечает ее запросы именем метода."""
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with operation_scope(method.__name__), self.metrics.timer('db_operation_seconds', operation=method.__name__):
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
+def positional_params(query: str) -> str:
+    """Заменяет параметры %s запроса на $1, $2, ... (и %% на %) для PREPARE."""
+    numbers = count(1)
+    return re.sub(r'%[s%]', lambda match: f"${next(numbers)}" if match[0] == '%s' else '%', query)
+
+
+class InstrumentedConnection(psycopg2.extensions.connection):
+    """
+    Соединение, которому DBManager при выдаче из пула назначает объект метрик
+    и словарь для планов EXPLAIN ANALYZE (None, если сбор планов выключен).
+    prepared - подготовленные в этом соединении запросы: текст запроса -> имя оператора PREPARE.
+    """
+    metrics: Metrics = default_metrics
+    explain_plans: dict | None = None
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.prepared = OrderedDict()
+
+
+class InstrumentedCursor(psycopg2.extensions.cursor):
+    """
+    Курсор, измеряющий время каждого запроса (метрика db_statement_seconds с метками operation и statement).
+    Если у соединения включен сбор планов, для SELECT-запросов предварительно выполняется
+    EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) и план сохраняется под именем операции.
+    """
+
+    def execute(self, query, vars=None):
+        text = query.decode() if isinstance(query, bytes) else str(query)
+        return self._execute(query, vars, text)
+
+    def execute_prepared(self, query: str, vars: tuple = ()):
+        """
+        Выполняет запрос query с параметрами %s как подготовленный на сервере оператор: при первом
+        выполнении в соединении запрос регистрируется командой PREPARE, затем выполняется командой EXECUTE
+        со значениями параметров, без повторного разбора, а после нескольких выполнений и без повторного
+        планирования (PostgreSQL переходит на общий план, если он не хуже планов для конкретных значений).
+        Значения передаются только параметрами, поэтому кавычки в данных не нарушают запрос.
+        Повторные выполнения учитываются метрикой db_statement_cache_hits_total,
+        регистрация запроса - db_statement_cache_misses_total (метка operation).
+        Подготовленные операторы не зависят от транзакций и живут до закрытия соединения;
+        в соединении хранится не более PREPARED_STATEMENTS_MAX запросов.
+        """
+        operation = getattr(_operation, 'name', None) or 'other'
+        prepared = self.connection.prepared
+        name = prepared.get(query)
+        if name is None:
+            name = f"dbm_{hashlib.md5(query.encode()).hexdigest()}"
+            self._execute(f"PREPARE {name} AS {positional_params(query)}", None, 'PREPARE')
+            prepared[query] = name
+            if len(prepared) > PREPARED_STATEMENTS_MAX:
+                _, oldest = prepared.popitem(last=False)
+                self._execute(f"DEALLOCATE {oldest}", None, 'DEALLOCATE')
+            self.connection.metrics.inc('db_statement_cache_misses_total', operation=operation)
+        else:
+            prepared.move_to_end(query)
+            self.connection.metrics.inc('db_statement_cache_hits_total', operation=operation)
+        arguments = f" ({', '.join(['%s'] * len(vars))})" if vars else ""
+        return self._execute(f"EXECUTE {name}{arguments}", vars, query)
+
+    def _execute(self, query, vars, source: str):
+        """Выполняет query; тип запроса для метрик и EXPLAIN определяется по тексту исходного запроса source."""
+        operation = getattr(_operation, 'name', None) or 'other'
+        statement = source.split(None, 1)[0].upper() if source.strip() else ''
+        if self.connection.explain_plans is not None and self.name is None and statement in ('SELECT', 'WITH'):
+            text = query.decode() if isinstance(query, bytes) else str(query)
+            super().execute(f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {text}", vars)
+            self.connection.explain_plans.setdefault(operation, []).append(self.fetchone()[0])
+        start = time.perf_counter()
+        try:
+            return super().execute(query, vars)
+        finally:
+            self.connection.metrics.observe('db_statement_seconds', time.perf_counter() - start,
+                                            operation=operation, statement=statement)
+
+
+def batched(data: Iterable, size: int) -> Iterator[list]:
+    """Разбивает итерируемый объект на списки длиной не более size элементов."""
+    iterator = iter(data)
+    while batch := list(islice(iterator, size)):
+        yield batch
 
 
 class DBManager:
     """
     Класс DBManager
-    подключается к БД PostgresSQL,
-    имеет следующие методы:
+    подключается к БД PostgresSQL через пул соединений ThreadedConnectionPool
+    (от minconn до maxconn соединений), методы класса можно вызывать из нескольких потоков.
+    Каждая операция берет соединение из пула на время выполнения и возвращает его обратно.
+    Имеет следующие методы:
+
+    connection()
+    - контекстный менеджер: выдает соединение из пула, фиксирует транзакцию
+      (или откатывает ее при ошибке) и возвращает соединение в пул
+
+    create_database(params: dict, partitioned=False)
+    - создание базы данных и необходимых таблиц по переданным параметрам;
+      при partitioned=True таблица vacancies секционируется по месяцам published_at
+
+    migrate()
+    - применение к БД недостающих миграций схемы (индексы, ограничения, новые колонки);
+      вызывается автоматически при создании объекта, обновляет существующую БД без перезагрузки данных
+
+    insert_data(table_name, data: Iterable[dict], load_mode='bulk', refresh=True)
+    - добавление данных в указанную таблицу; повторяющиеся значения вакансий (area, type, currency,
+      schedule, experience, employment) хранятся в справочниках и заменяются их ключами,
+      все профессиональные роли вакансии сохраняются в vacancy_professional_roles
+
+    enqueue_crawl_tasks(tasks), claim_crawl_task(worker, lease), finish_crawl_task(task_id, status, ...),
+    get_crawl_status(), reset_crawl_queue()
+    - очередь задач обхода вакансий (таблица crawl_queue) для параллельной загрузки
+      несколькими процессами (см. src/crawler.py)
 
-    create_database(params: dict)
-    - создание базы данных и необходимых таблиц по переданным параметрам
+    apply_retention(months)
+    - удаление вакансий, опубликованных раньше, чем months месяцев назад
+      (при секционированной схеме - удаление целых секций)
 
-    insert_data(table_name, data: list[dict])
-    - добавление данных в указанную таблицу
+    get_sync_state(employer_hh_id), set_sync_state(employer_hh_id, last_published_at)
+    - чтение и сохранение отметки инкрементальной синхронизации работодателя
+      (дата публикации самой новой загруженной вакансии)
+
+    close_vanished_vacancies(employer_hh_id, vacancy_hh_ids)
+    - отметка закрытыми вакансий работодателя, которые исчезли с hh.ru
+
+    refresh_stats()
+    - пересчет материализованных представлений со статистикой (salary_stats*, employer_vacancy_counts);
+      выполняется автоматически после загрузки вакансий
+
+    Методы get_* и iter_all_vacancies принимают необязательный период публикации вакансий
+    date_from, date_to (включительно); при секционированной схеме просматриваются только секции периода.
 
     get_companies_and_vacancies_count()
      — получение списка всех компаний и количество вакансий у каждой компании.
@@ -20,286 +507,902 @@ class DBManager:
      — получение списка всех вакансий с указанием названия компании,
     названия вакансии и зарплаты и ссылки на вакансию.
 
+    iter_all_vacancies(after_id=0, limit=None, itersize=ITERSIZE)
+     — то же, но генератором записей VacancyRecord через серверный курсор,
+    с постраничной выборкой по vacancies_id (после after_id, не более limit записей).
+
     get_avg_salary()
      — получение средней зарплаты по вакансиям. (В разрезе currency, gross).
 
+    get_salary_stats(by_area=False, by_experience=False)
+     — получение статистики зарплат: количество вакансий, средние, медианы и квартили
+    salary_from/salary_to в разрезе currency, gross (и, по запросу, area, experience).
+
+    get_salary_stats_local(by_area=False, by_experience=False)
+     — та же статистика, вычисленная векторными операциями pyarrow по выгруженным колонкам.
+
     get_vacancies_with_higher_salary()
      — получение списка всех вакансий, у которых зарплата выше средней по всем вакансиям. (В разрезе currency, gross).
 
 
-    get_vacancies_with_keyword()
-     — получение списка всех вакансий, в названии которых содержатся переданные
-    в метод слова, например python.
+    get_vacancies_with_keyword(keyword: str | list[str], limit=None, offset=0)
+     — получение списка всех вакансий, в названии, профессиональной роли или описании которых
+    содержатся переданные в метод слова, например python. Поиск полнотекстовый (по GIN-индексу),
+    без учета регистра и словоформ, результат отсортирован по релевантности.
+
+    iter_vacancy_batches(columns=None, date_from=None, date_to=None)
+     — потоковая выгрузка вакансий с данными компаний через COPY порциями pyarrow.RecordBatch.
+
+    export_vacancies(path, columns=None, date_from=None, date_to=None, export_format='parquet')
+     — выгрузка вакансий в файл Parquet или Arrow IPC.
 
     close_conn()
-    - завершение коннекции
+    - закрытие всех соединений пула
+
+    Для выгрузки в Arrow/Parquet и get_salary_stats_local нужен необязательный пакет pyarrow.
+
+    Время операций, время каждого SQL-запроса и количество вставленных/пропущенных строк
+    учитываются в объекте metrics (по умолчанию общий src.metrics.default_metrics).
+    Повторяющиеся запросы выполняются как подготовленные на сервере (см. InstrumentedCursor.execute_prepared),
+    повторные выполнения подготовленных запросов учитываются метрикой db_statement_cache_hits_total.
+    При explain=True для SELECT-запросов сохраняются планы EXPLAIN ANALYZE в explain_plans
+    (словарь {имя операции: [план, ...]}).
 
 
     """
 
-    def __init__(self, params: dict):
+    def __init__(self, params: dict, minconn: int = POOL_MINCONN, maxconn: int = POOL_MAXCONN,
+                 metrics: Metrics = None, explain: bool = False, partitioned: bool = False):
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.metrics = metrics if metrics is not None else default_metrics
+        self.explain = explain
+        self.explain_plans = {}
+        # пул не блокирует вызывающего при исчерпании соединений, поэтому ограничиваем выдачу семафором
+        self.__semaphore = threading.BoundedSemaphore(maxconn)
+        # месяцы, для которых секции таблицы vacancies уже созданы (при секционированной схеме)
+        self.__partitions = set()
+        # кэш справочников: значение VACANCY_VALUES -> {название: ключ}
+        self.__dimensions = {dimension: {} for dimension in DIMENSION_TABLES}
         try:
-            self.conn = psycopg2.connect(dbname=params['dbname'], user=params['user'], host=params['host'],
-                                         password=params['password'], port=params['port'])
+            self.pool = self._create_pool(params)
         except psycopg2.OperationalError:
-            self.create_database(params)
+            self.create_database(params, partitioned)
+        self.migrate()
+        self.partitioned = self._is_partitioned()
+
+    def _create_pool(self, params: dict) -> ThreadedConnectionPool:
+        return ThreadedConnectionPool(self.minconn, self.maxconn,
+                                      dbname=params['dbname'], user=params['user'], host=params['host'],
+                                      password=params['password'], port=params['port'],
+                                      connection_factory=InstrumentedConnection,
+                                      cursor_factory=InstrumentedCursor)
+
+    @contextmanager
+    def connection(self) -> Iterator[psycopg2.extensions.connection]:
+        """
+        Выдает соединение из пула на время операции. Если свободных соединений нет, ждет их освобождения.
+        При успешном завершении фиксирует транзакцию, при ошибке - откатывает.
+        """
+        with self.__semaphore:
+            conn = self.pool.getconn()
+            conn.metrics = self.metrics
+            conn.explain_plans = self.explain_plans if self.explain else None
+            try:
+                yield conn
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            finally:
+                self.pool.putconn(conn)
 
     def close_conn(self):
-        self.conn.close()
+        self.pool.closeall()
+
+    @instrumented
+    def migrate(self):
+        """
+        Применяет миграции из MIGRATIONS, которых еще нет в таблице schema_migrations.
+        Каждая миграция выполняется в отдельной транзакции вместе с записью ее версии.
+        Одновременный запуск из нескольких процессов сериализуется advisory-блокировкой.
+        """
+        with self.connection() as conn, conn.cursor() as cur:
+            self._create_schema_migrations(cur)
+        for version, description, statements in MIGRATIONS:
+            with self.connection() as conn, conn.cursor() as cur:
+                cur.execute("SELECT pg_advisory_xact_lock(hashtext('schema_migrations'))")
+                cur.execute("SELECT 1 FROM schema_migrations WHERE version = %s", (version,))
+                if cur.fetchone():
+                    continue
+                print(f"Применение миграции {version}: {description}")
+                for statement in statements:
+                    cur.execute(statement)
+                cur.execute("INSERT INTO schema_migrations (version, description) VALUES (%s, %s)",
+                            (version, description))
+
+    @staticmethod
+    def _create_schema_migrations(cur):
+        cur.execute("CREATE TABLE IF NOT EXISTS schema_migrations ("
+                    "version INT PRIMARY KEY, "
+                    "description VARCHAR, "
+                    "applied_at TIMESTAMP NOT NULL DEFAULT now())")
 
-    def create_database(self, params: dict):
-        """Создание базы данных и таблиц для сохранения данных."""
+    def create_database(self, params: dict, partitioned: bool = False):
+        """
+        Создание базы данных и таблиц для сохранения данных.
+        При partitioned=True таблица vacancies создается секционированной по диапазонам published_at:
+        секции по месяцам создаются автоматически при загрузке, старые секции удаляются целиком
+        (apply_retention). Первичный и уникальный ключи секционированной таблицы включают published_at.
+        """
         print("Создание базы данных и таблиц для сохранения данных.")
-        self.conn = psycopg2.connect(dbname='postgres', user=params['user'], host=params['host'],
-                                     password=params['password'], port=params['port'])
-        self.conn.autocommit = True
-        cur = self.conn.cursor()
+        conn = psycopg2.connect(dbname='postgres', user=params['user'], host=params['host'],
+                                password=params['password'], port=params['port'])
+        conn.autocommit = True
+        cur = conn.cursor()
 
         cur.execute(f"CREATE DATABASE {params['dbname']}")
 
-        self.conn.close()
-
-        self.conn = psycopg2.connect(dbname=params['dbname'], user=params['user'], host=params['host'],
-                                     password=params['password'], port=params['port'])
-
-        with self.conn.cursor() as cur:
-            cur.execute("""
-                CREATE TABLE employers (
-                    employer_id SERIAL PRIMARY KEY,
-                    employer_hh_id INT UNIQUE,
-                    alternate_url VARCHAR,
-                    name VARCHAR(50) NOT NULL,
-                    url VARCHAR(50),
-                    vacancies_url VARCHAR,
-                    open_vacancies INTEGER
-                )
-            """)
-
-        with self.conn.cursor() as cur:
-            cur.execute("""
-                CREATE TABLE vacancies (
-                    vacancies_id SERIAL PRIMARY KEY,
-                    vacancy_hh_id INT,
-                    employer_id INT REFERENCES employers(employer_id),
-                    name VARCHAR NOT NULL,
-                    area VARCHAR,
-                    salary_from INT,
-                    salary_to INT,
-                    currency VARCHAR,
-                    gross bool,
-                    type VARCHAR,
-                    address VARCHAR,
-                    published_at DATE,
-                    created_at DATE,
-                    url VARCHAR,
-                    alternate_url VARCHAR,
-                    snippet_requirement TEXT,
-                    snippet_responsibility TEXT,
-                    schedule VARCHAR,
-                    professional_roles VARCHAR,
-                    experience VARCHAR,
-                    employment VARCHAR
-                )
-            """)
-
-        self.conn.commit()
-
-    def insert_data(self, table_name: str, data: list[dict]):
-        #Вставляем данные в таблицу vacancies
-        if table_name == 'vacancies':
-            for item in data:
-                count = 0
-                with self.conn.cursor() as cur:
-                    #находим id работодателя в таблице employers
-                    cur.execute(f"SELECT employer_id FROM employers "
-                                f"WHERE employers.employer_hh_id = {item['employer']['id']}")
-                    employer_id = cur.fetchall()
-
-                    #если данные не были переданы в запросе, объявляем их None
-                    if item["address"]:
-                        address = item["address"]["raw"]
-                    else:
-                        address = None
-                    if item["salary"]:
-                        if item["salary"]["from"]:
-                            salary_from = item["salary"]["from"]
-                        else:
-                            salary_from = None
-                        if item["salary"]["to"]:
-                            salary_to = item["salary"]["to"]
-                        else:
-                            salary_to = None
-                        currency = item["salary"]["currency"]
-                        if item["salary"]["gross"]:
-                            gross = item["salary"]["gross"]
+        conn.close()
+
+        self.pool = self._create_pool(params)
+
+        with self.connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("""
+                    CREATE TABLE employers (
+                        employer_id SERIAL PRIMARY KEY,
+                        employer_hh_id INT UNIQUE,
+                        alternate_url VARCHAR,
+                        name VARCHAR(50) NOT NULL,
+                        url VARCHAR(50),
+                        vacancies_url VARCHAR,
+                        open_vacancies INTEGER
+                    )
+                """)
+
+            with conn.cursor() as cur:
+                cur.execute(f"""
+                    CREATE TABLE vacancies (
+                        vacancies_id SERIAL{'' if partitioned else ' PRIMARY KEY'},
+                        vacancy_hh_id INT,
+                        employer_id INT REFERENCES employers(employer_id),
+                        name VARCHAR NOT NULL,
+                        area VARCHAR,
+                        salary_from INT,
+                        salary_to INT,
+                        currency VARCHAR,
+                        gross bool,
+                        type VARCHAR,
+                        address VARCHAR,
+                        published_at DATE{' NOT NULL' if partitioned else ''},
+                        created_at DATE,
+                        url VARCHAR,
+                        alternate_url VARCHAR,
+                        snippet_requirement TEXT,
+                        snippet_responsibility TEXT,
+                        schedule VARCHAR,
+                        professional_roles VARCHAR,
+                        experience VARCHAR,
+                        employment VARCHAR{', PRIMARY KEY (vacancies_id, published_at)' if partitioned else ''}
+                    ){' PARTITION BY RANGE (published_at)' if partitioned else ''}
+                """)
+                if partitioned:
+                    # уникальный индекс секционированной таблицы должен включать ключ секционирования,
+                    # поэтому он создается вместе с таблицей, а миграция 1 отмечается примененной
+                    cur.execute("CREATE UNIQUE INDEX vacancies_vacancy_hh_id_key "
+                                "ON vacancies (vacancy_hh_id, published_at)")
+                    self._create_schema_migrations(cur)
+                    cur.execute("INSERT INTO schema_migrations (version, description) VALUES (%s, %s)",
+                                MIGRATIONS[0][:2])
+
+    def _is_partitioned(self) -> bool:
+        with self.connection() as conn, conn.cursor() as cur:
+            cur.execute("SELECT relkind = 'p' FROM pg_class WHERE oid = 'vacancies'::regclass")
+            return cur.fetchone()[0]
+
+    def _ensure_partitions(self, conn, published_at: Iterable[str]):
+        """
+        Создает недостающие секции таблицы vacancies для месяцев дат публикации published_at
+        (строки в формате API hh.ru). Секции создаются в отдельной транзакции под advisory-блокировкой,
+        поэтому одновременная загрузка из нескольких процессов не создает одну секцию дважды.
+        Фиксирует транзакцию conn, поэтому вызывается в начале пакета (или строки при построчной загрузке),
+        когда в соединении нет незафиксированных изменений.
+        """
+        months = {month_start(date.fromisoformat(value[:10])) for value in published_at} - self.__partitions
+        if not months:
+            return
+        with conn.cursor() as cur:
+            cur.execute("SELECT pg_advisory_xact_lock(hashtext('vacancies_partitions'))")
+            for month in sorted(months):
+                cur.execute(f"CREATE TABLE IF NOT EXISTS {partition_name(month)} PARTITION OF vacancies "
+                            f"FOR VALUES FROM (%s) TO (%s)", (month, next_month(month)))
+        conn.commit()
+        self.__partitions.update(months)
+
+    @staticmethod
+    def _vacancy_row(item: dict) -> tuple:
+        """
+        Преобразует вакансию из ответа API в кортеж значений VACANCY_VALUES.
+        Вместо employer_id возвращает employer_hh_id, он заменяется на employer_id при вставке.
+        Значения справочников возвращаются названиями, профессиональные роли - кортежем названий.
+        """
+        salary = item["salary"] or {}
+        return (item["id"], item["employer"]["id"],
+                item["name"], item["area"]["name"],
+                salary.get("from") or None, salary.get("to") or None,
+                salary.get("currency"), salary.get("gross") or None,
+                item["type"]["name"], item["address"]["raw"] if item["address"] else None,
+                item["published_at"], item["created_at"], item["url"],
+                item["alternate_url"], item["snippet"]["requirement"],
+                item["snippet"]["responsibility"],
+                item["schedule"]["name"], item["experience"]["name"], item["employment"]["name"],
+                tuple(dict.fromkeys(role["name"] for role in item["professional_roles"])))
+
+    def _intern_dimensions(self, conn, rows: list[tuple]):
+        """
+        Добавляет в справочники значения из строк rows (см. _vacancy_row), которых еще нет в кэше
+        self.__dimensions, и запоминает их ключи. Справочники небольшие, поэтому после первых пакетов
+        все значения уже в кэше и запросов к БД не требуется. Новые значения фиксируются в отдельной
+        транзакции, чтобы ключи в кэше не ссылались на откаченные строки.
+        Фиксирует транзакцию conn, поэтому вызывается в начале пакета (или строки при построчной загрузке),
+        когда в соединении нет незафиксированных изменений.
+        """
+        missing = {}
+        for dimension, table in DIMENSION_TABLES.items():
+            index = VACANCY_VALUES.index(dimension)
+            names = set()
+            for row in rows:
+                names.update(row[index] if dimension == ROLES_DIMENSION else (row[index],))
+            names -= self.__dimensions[dimension].keys()
+            names.discard(None)
+            if names:
+                missing[dimension] = list(names)
+        if not missing:
+            return
+        keys = {}
+        with conn.cursor() as cur:
+            for dimension, names in missing.items():
+                table = DIMENSION_TABLES[dimension]
+                cur.execute_prepared(f"SELECT name, id FROM {table} WHERE name = ANY(%s::varchar[])", (names,))
+                keys[dimension] = dict(cur.fetchall())
+                new_names = [name for name in names if name not in keys[dimension]]
+                if new_names:
+                    cur.execute_prepared(f"INSERT INTO {table} (name) SELECT unnest(%s::varchar[]) "
+                                         f"ON CONFLICT (name) DO NOTHING", (new_names,))
+                    # значения, одновременно добавленные другим процессом, читаются после его фиксации
+                    cur.execute_prepared(f"SELECT name, id FROM {table} WHERE name = ANY(%s::varchar[])",
+                                         (new_names,))
+                    keys[dimension].update(cur.fetchall())
+        conn.commit()
+        for dimension, dimension_keys in keys.items():
+            self.__dimensions[dimension].update(dimension_keys)
+
+    def _vacancy_values(self, row: tuple) -> tuple[tuple, list[tuple]]:
+        """
+        Заменяет в строке _vacancy_row названия из справочников их ключами (значения должны быть
+        добавлены _intern_dimensions) и возвращает строку для VACANCY_INSERT_SQL и связи вакансии
+        с профессиональными ролями (vacancy_hh_id, role_id, position).
+        """
+        values = list(row)
+        for dimension in VACANCY_DIMENSIONS:
+            index = VACANCY_VALUES.index(dimension)
+            values[index] = self.__dimensions[dimension].get(values[index])
+        roles = values[-1]
+        values[-1] = ", ".join(roles)  # текст ролей нужен только для поискового вектора
+        links = [(row[0], self.__dimensions[ROLES_DIMENSION][name], position) for position, name in enumerate(roles)]
+        return tuple(values), links
+
+    @staticmethod
+    def _insert_roles(cur, vacancy_hh_ids: list, links: list[tuple], replace: bool = False):
+        """
+        Сохраняет связи вакансий с профессиональными ролями. При replace=True прежние роли вакансий
+        vacancy_hh_ids удаляются. Связи сохраняются только для вакансий, которые есть в таблице vacancies.
+        """
+        if replace:
+            cur.execute_prepared("DELETE FROM vacancy_professional_roles WHERE vacancy_hh_id = ANY(%s::int[])",
+                                 ([int(vacancy_hh_id) for vacancy_hh_id in vacancy_hh_ids],))
+        if links:
+            # связи передаются массивами по колонкам: запрос не зависит от количества строк и готовится один раз
+            cur.execute_prepared("INSERT INTO vacancy_professional_roles (vacancy_hh_id, role_id, position) "
+                                 "SELECT v.vacancy_hh_id, v.role_id, v.position "
+                                 "FROM unnest(%s::int[], %s::smallint[], %s::smallint[]) "
+                                 "AS v (vacancy_hh_id, role_id, position) "
+                                 "WHERE EXISTS (SELECT 1 FROM vacancies "
+                                 "WHERE vacancies.vacancy_hh_id = v.vacancy_hh_id) "
+                                 "ON CONFLICT DO NOTHING",
+                                 ([int(link[0]) for link in links], [link[1] for link in links],
+                                  [link[2] for link in links]))
+
+    def _insert_vacancies_bulk(self, conn, data: list[dict], upsert: bool = False):
+        """
+        Пакетная вставка вакансий: все строки передаются одним многострочным INSERT,
+        employer_id находится join'ом с employers по employer_hh_id.
+        Дубли по vacancy_hh_id отбрасываются через ON CONFLICT, а при upsert=True
+        существующие вакансии обновляются (только если их данные изменились) и снова считаются открытыми.
+        В секционированной таблице уникальный ключ - (vacancy_hh_id, published_at), поэтому уже загруженные
+        вакансии с другой датой публикации пропускаются, а при upsert=True удаляются перед вставкой
+        (вакансия переносится в секцию новой даты).
+        Значения справочников заменяются ключами из кэша, профессиональные роли сохраняются
+        в vacancy_professional_roles (при upsert=True заменяются).
+        """
+        # внутри пакета оставляем последнюю версию каждой вакансии: ON CONFLICT DO UPDATE
+        # не может изменить одну строку дважды в одном запросе
+        rows = list({row[0]: row for row in map(self._vacancy_row, data)}.values())
+        if not rows:
+            return
+        self._intern_dimensions(conn, rows)
+        if self.partitioned:
+            self._ensure_partitions(conn, (row[10] for row in rows))
+        values, links = [], []
+        for row in rows:
+            row_values, row_links = self._vacancy_values(row)
+            values.append(row_values)
+            links.extend(row_links)
+        conflict_key = "vacancy_hh_id, published_at" if self.partitioned else "vacancy_hh_id"
+        where = ""
+        if upsert:
+            updated = ", ".join(VACANCY_COLUMNS[1:])
+            excluded = ", ".join(f"EXCLUDED.{column}" for column in VACANCY_COLUMNS[1:])
+            current = ", ".join(f"vacancies.{column}" for column in VACANCY_COLUMNS[1:])
+            on_conflict = (f"DO UPDATE SET ({updated}) = ({excluded}), closed_at = NULL "
+                           f"WHERE ({current}) IS DISTINCT FROM ({excluded}) OR vacancies.closed_at IS NOT NULL")
+        else:
+            on_conflict = "DO NOTHING"
+            if self.partitioned:
+                where = VACANCY_NOT_EXISTS_SQL
+        with conn.cursor() as cur:
+            if self.partitioned and upsert:
+                execute_values(cur,
+                               "DELETE FROM vacancies USING (VALUES %s) AS v (vacancy_hh_id, published_at) "
+                               "WHERE vacancies.vacancy_hh_id = v.vacancy_hh_id "
+                               "AND vacancies.published_at <> v.published_at",
+                               [(row[0], row[10]) for row in rows], template="(%s::int, %s::date)",
+                               page_size=len(rows))
+            execute_values(cur, f"{VACANCY_INSERT_SQL}{where}ON CONFLICT ({conflict_key}) {on_conflict}",
+                           values, template=VACANCY_VALUES_TEMPLATE, page_size=len(values))
+            self.metrics.inc('db_rows_inserted_total', cur.rowcount, table='vacancies')
+            self.metrics.inc('db_rows_skipped_total', len(rows) - cur.rowcount, table='vacancies')
+            self._insert_roles(cur, [row[0] for row in rows], links, replace=upsert)
+
+    @instrumented
+    def insert_data(self, table_name: str, data: Iterable[dict], load_mode: str = 'bulk',
+                    batch_size: int = BATCH_SIZE, refresh: bool = True):
+        """
+        Добавление данных в таблицу table_name.
+        data может быть списком или генератором (например, HH.iter_items()).
+        Для таблицы vacancies load_mode задает способ загрузки:
+        'bulk' - пакетная вставка (по умолчанию), данные читаются из data и фиксируются
+                 пакетами по batch_size строк, по мере поступления;
+        'upsert' - пакетная вставка с обновлением изменившихся вакансий;
+        'row' - построчная вставка, каждая строка фиксируется отдельно.
+        После загрузки вакансий пересчитывается статистика (refresh_stats), если не передано refresh=False
+        (например, при загрузке многими небольшими порциями статистика пересчитывается один раз в конце).
+        """
+        if load_mode not in LOAD_MODES:
+            raise ValueError(f"Неизвестный режим загрузки: {load_mode}. Допустимые режимы: {LOAD_MODES}")
+
+        with self.connection() as conn:
+            # Пакетно вставляем данные в таблицу vacancies
+            if table_name == 'vacancies' and load_mode in ('bulk', 'upsert'):
+                for batch in batched(data, batch_size):
+                    self._insert_vacancies_bulk(conn, batch, upsert=load_mode == 'upsert')
+                    conn.commit()
+
+            #Построчно вставляем данные в таблицу vacancies, каждая строка фиксируется отдельно:
+            #ошибка в строке откатывает только ее, а не вставленные ранее строки
+            elif table_name == 'vacancies':
+                for item in data:
+                    count = 0
+                    row = self._vacancy_row(item)
+                    # новые значения справочников добавляются до проверки дубля: в ней сравниваются их ключи
+                    self._intern_dimensions(conn, [row])
+                    values, roles = self._vacancy_values(row)
+                    value = dict(zip(VACANCY_VALUES, values))
+                    with conn.cursor() as cur:
+                        #находим id работодателя в таблице employers
+                        cur.execute_prepared("SELECT employer_id FROM employers "
+                                             "WHERE employers.employer_hh_id = %s::int", (item['employer']['id'],))
+                        employer_id = cur.fetchall()
+
+                        #вакансия работодателя, которого нет в таблице employers, пропускается
+                        if not employer_id:
+                            print(f"Работодатель {item['employer']['id']} вакансии {item['id']} не найден")
+                            self.metrics.inc('db_rows_skipped_total', table=table_name)
+                            continue
+
+                        #запрос для проверки наличия дубля в таблице (значения передаются параметрами,
+                        #колонки, которые могут быть NULL, сравниваются через IS NOT DISTINCT FROM)
+                        try:
+                            cur.execute_prepared(
+                                f"SELECT COUNT(*) FROM {table_name} WHERE vacancy_hh_id = %s::int AND "
+                                f"employer_id = %s AND {table_name}.name IS NOT DISTINCT FROM %s AND "
+                                f"area_id IS NOT DISTINCT FROM %s AND type_id IS NOT DISTINCT FROM %s AND "
+                                f"published_at = %s::date AND created_at IS NOT DISTINCT FROM %s::date AND "
+                                f"url IS NOT DISTINCT FROM %s AND alternate_url IS NOT DISTINCT FROM %s AND "
+                                f"snippet_requirement IS NOT DISTINCT FROM %s AND "
+                                f"snippet_responsibility IS NOT DISTINCT FROM %s AND "
+                                f"schedule_id IS NOT DISTINCT FROM %s AND experience_id IS NOT DISTINCT FROM %s AND "
+                                f"employment_id IS NOT DISTINCT FROM %s",
+                                (item['id'], employer_id[0][0], item['name'], value['area'], value['type'],
+                                 item['published_at'], item['created_at'], item['url'], item['alternate_url'],
+                                 item['snippet']['requirement'], item['snippet']['responsibility'],
+                                 value['schedule'], value['experience'], value['employment']))
+                        except psycopg2.Error as e:
+                            print("Пыталась проверять наличие дубля. ", e)
+                            conn.rollback()
                         else:
-                            gross = None
+                            count = cur.fetchall()[0][0]
 
-                    else:
-                        salary_from = None
-                        salary_to = None
-                        currency = None
-                        gross = None
+                        #если дубль найден, то не вставляем данные в таблицу и переходим к следующей записи
+                        if count > 0:
+                            self.metrics.inc('db_rows_skipped_total', table=table_name)
+                            continue
+                        # если дубль не найден, то вставляем данные в таблицу
+                        else:
+                            if self.partitioned:
+                                self._ensure_partitions(conn, [item["published_at"]])
+                            # уже загруженная вакансия (например, изменившаяся) пропускается через ON CONFLICT
+                            where = VACANCY_NOT_EXISTS_SQL if self.partitioned else ""
+                            try:
+                                cur.execute_prepared(f"{VACANCY_INSERT_ROW_SQL}{where}ON CONFLICT DO NOTHING", values)
+                                inserted = cur.rowcount
+                                if inserted:
+                                    self._insert_roles(cur, [item["id"]], roles)
+                                conn.commit()
+                            except psycopg2.Error as ex1:
+                                print("error: ", ex1)
+                                conn.rollback()
+                                self.metrics.inc('db_rows_skipped_total', table=table_name)
+                            else:
+                                if inserted:
+                                    self.metrics.inc('db_rows_inserted_total', table=table_name)
+                                else:
+                                    self.metrics.inc('db_rows_skipped_total', table=table_name)
 
-                    #запрос для проверки наличия дубля в таблице
-                    try:
-                        sql_str = (f"SELECT COUNT(*) FROM {table_name} WHERE vacancy_hh_id = {item['id']} AND "
-                                   f"employer_id = {employer_id[0][0]} AND {table_name}.name = '{item['name']}' AND "
-                                   f"area = '{item['area']['name']}' AND type = '{item['type']['name']}' AND "
-                                   f"published_at = '{item['published_at']}' AND "
-                                   f"created_at = '{item['created_at']}' AND "
-                                   f"url = '{item['url']}' AND alternate_url = '{item['alternate_url']}' AND "
-                                   f"snippet_requirement = '{item['snippet']['requirement']}' AND "
-                                   f"snippet_responsibility = '{item['snippet']['responsibility']}' AND "
-                                   f"schedule = '{item['schedule']['name']}' AND "
-                                   f"professional_roles = '{item['professional_roles'][0]['name']}' AND "
-                                   f"experience = '{item['experience']['name']}' AND "
-                                   f"employment = '{item['employment']['name']}'")
-                        # print(sql_str)
-                        cur.execute(sql_str)
-                    except Exception as e:
-                        print("Пыталась проверять наличие дубля. ", e)
-                        self.conn.rollback()
-                    else:
-                        count = cur.fetchall()[0][0]
-
-                    #если дубль найден, то не вставляем данные в таблицу и переходим к следующей записи
-                    if count > 0:
-                        break
-                    # если дубль не найден, то вставляем данные в таблицу
-                    else:
+            # Вставляем данные в таблицу employers
+            if table_name == 'employers':
+                for item in data:
+                    with conn.cursor() as cur:
                         try:
-                            cur.execute(
+                            cur.execute_prepared(
                                 f"INSERT INTO {table_name} "
-                                f"(vacancy_hh_id, employer_id, "
-                                f"name, area, "
-                                f"salary_from, salary_to, currency, gross, type, address, "
-                                f"published_at, created_at, url, alternate_url, "
-                                f"snippet_requirement, snippet_responsibility, "
-                                f"schedule, "
-                                f"professional_roles,"
-                                f"experience, employment) "
-                                f"VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, "
-                                f"%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)",
-                                (item["id"], employer_id[0][0],
-                                 item["name"], item["area"]["name"],
-                                 salary_from, salary_to,
-                                 currency, gross,
-                                 item["type"]["name"], address,
-                                 item["published_at"], item["created_at"], item["url"],
-                                 item["alternate_url"], item["snippet"]["requirement"],
-                                 item["snippet"]["responsibility"],
-                                 item["schedule"]["name"], item["professional_roles"][0]["name"],
-                                 item["experience"]["name"], item["employment"]["name"]))
-                        except psycopg2.errors.UniqueViolation as ex:
-                            print("Duplicate: ", ex)
-                            self.conn.rollback()
+                                f"(employer_hh_id, alternate_url, name, url, "
+                                f"vacancies_url, open_vacancies) "
+                                f"VALUES (%s, %s, %s, %s, %s, %s) "
+                                f"ON CONFLICT (employer_hh_id) DO NOTHING",
+                                (item["id"], item["alternate_url"], item["name"], item["url"],
+                                 item["vacancies_url"], item["open_vacancies"]))
                         except psycopg2.errors.InFailedSqlTransaction as ex1:
                             print("error: ", ex1)
-                            self.conn.rollback()
+                            conn.rollback()
+                        else:
+                            # уже сохраненный работодатель пропускается без отката транзакции,
+                            # иначе откатились бы и добавленные перед ним работодатели
+                            if cur.rowcount:
+                                self.metrics.inc('db_rows_inserted_total', table=table_name)
+                            else:
+                                self.metrics.inc('db_rows_skipped_total', table=table_name)
 
-        # Вставляем данные в таблицу employers
-        if table_name == 'employers':
-            for item in data:
-                with self.conn.cursor() as cur:
-                    try:
-                        cur.execute(
-                            f"INSERT INTO {table_name} "
-                            f"(employer_hh_id, alternate_url, name, url, "
-                            f"vacancies_url, open_vacancies) "
-                            f"VALUES (%s, %s, %s, %s, %s, %s)",
-                            (item["id"], item["alternate_url"], item["name"], item["url"],
-                             item["vacancies_url"], item["open_vacancies"]))
-                    except psycopg2.errors.UniqueViolation as ex:
-                        print("Duplicate: ", ex)
-                        self.conn.rollback()
-                    except psycopg2.errors.InFailedSqlTransaction as ex1:
-                        print("error: ", ex1)
-                        self.conn.rollback()
-
-        self.conn.commit()
-
-    def get_companies_and_vacancies_count(self) -> list[dict]:
-        with self.conn.cursor() as cur:
-            cur.execute(f"SELECT employers.name, COUNT(*) FROM employers "
-                        f"JOIN vacancies USING (employer_id) GROUP BY employer_id "
-                        f"ORDER BY COUNT(*) DESC")
+        # статистика в материализованных представлениях пересчитывается после загрузки вакансий
+        if table_name == 'vacancies' and refresh:
+            self.refresh_stats()
+
+    @instrumented
+    def enqueue_crawl_tasks(self, tasks: Iterable[tuple[int, dict]]) -> int:
+        """
+        Добавляет в очередь crawl_queue задачи (employer_hh_id, params) со статусом 'pending'.
+        Уже существующие задачи с теми же работодателем и параметрами не добавляются.
+        Возвращает количество добавленных задач.
+        """
+        rows = [(employer_hh_id, json.dumps(params, sort_keys=True)) for employer_hh_id, params in tasks]
+        if not rows:
+            return 0
+        with self.connection() as conn, conn.cursor() as cur:
+            execute_values(cur,
+                           "INSERT INTO crawl_queue (employer_hh_id, params) VALUES %s "
+                           "ON CONFLICT (employer_hh_id, params) DO NOTHING",
+                           rows, template="(%s::int, %s::jsonb)", page_size=len(rows))
+            return cur.rowcount
+
+    @instrumented
+    def claim_crawl_task(self, worker: str, lease: float) -> CrawlTask | None:
+        """
+        Выдает обработчику worker следующую задачу из очереди и отмечает ее как 'running'.
+        Задача, выполняемая дольше lease секунд (обработчик упал или завис), выдается повторно.
+        Строки очереди блокируются с SKIP LOCKED, поэтому несколько процессов не получат одну задачу.
+        Возвращает CrawlTask или None, если свободных задач нет.
+        """
+        with self.connection() as conn, conn.cursor() as cur:
+            cur.execute_prepared("UPDATE crawl_queue SET status = 'running', attempts = attempts + 1, "
+                                 "worker = %s, locked_at = now(), updated_at = now() "
+                                 "WHERE task_id = (SELECT task_id FROM crawl_queue "
+                                 "WHERE status = 'pending' "
+                                 "OR (status = 'running' AND locked_at < now() - %s::float8 * interval '1 second') "
+                                 "ORDER BY task_id LIMIT 1 FOR UPDATE SKIP LOCKED) "
+                                 "RETURNING task_id, employer_hh_id, params, attempts",
+                                 (worker, lease))
+            data = cur.fetchone()
+        return CrawlTask(*data) if data else None
+
+    @instrumented
+    def finish_crawl_task(self, task_id: int, status: str, found: int = None, loaded: int = None,
+                          error: str = None):
+        """
+        Сохраняет результат задачи очереди: status - 'done', 'split' (задача разбита на более узкие),
+        'failed' или 'pending' (повторить позже), found/loaded - найдено и загружено вакансий.
+        """
+        if status not in CRAWL_STATUSES:
+            raise ValueError(f"Неизвестный статус задачи: {status}. Допустимые статусы: {CRAWL_STATUSES}")
+        with self.connection() as conn, conn.cursor() as cur:
+            cur.execute_prepared("UPDATE crawl_queue SET status = %s, found = %s, loaded = %s, error = %s, "
+                                 "locked_at = NULL, updated_at = now() WHERE task_id = %s",
+                                 (status, found, loaded, error, task_id))
+
+    @instrumented
+    def get_crawl_status(self) -> dict:
+        """Возвращает количество задач очереди по статусам и общее количество загруженных вакансий."""
+        with self.connection() as conn, conn.cursor() as cur:
+            cur.execute("SELECT status, COUNT(*), COALESCE(SUM(loaded), 0) FROM crawl_queue GROUP BY status")
+            data = cur.fetchall()
+        status = {name: 0 for name in CRAWL_STATUSES}
+        status.update({d[0]: d[1] for d in data})
+        status['loaded'] = sum(d[2] for d in data)
+        return status
+
+    @instrumented
+    def reset_crawl_queue(self):
+        """Очищает очередь задач обхода перед новым обходом."""
+        with self.connection() as conn, conn.cursor() as cur:
+            cur.execute("TRUNCATE crawl_queue RESTART IDENTITY")
+
+    @instrumented
+    def get_sync_state(self, employer_hh_id: int) -> datetime | None:
+        """Возвращает дату публикации самой новой загруженной вакансии работодателя (high-water mark)."""
+        with self.connection() as conn, conn.cursor() as cur:
+            cur.execute_prepared("SELECT last_published_at FROM sync_state JOIN employers USING (employer_id) "
+                                 "WHERE employers.employer_hh_id = %s", (employer_hh_id,))
+            data = cur.fetchone()
+        return data[0] if data else None
+
+    @instrumented
+    def set_sync_state(self, employer_hh_id: int, last_published_at: datetime | None):
+        """
+        Сохраняет high-water mark работодателя и время синхронизации.
+        Отметка только растет: более ранняя дата или None не уменьшают сохраненное значение.
+        """
+        with self.connection() as conn, conn.cursor() as cur:
+            cur.execute_prepared("INSERT INTO sync_state (employer_id, last_published_at, last_synced_at) "
+                                 "SELECT employer_id, %s::timestamptz, now() FROM employers WHERE employer_hh_id = %s "
+                                 "ON CONFLICT (employer_id) DO UPDATE SET "
+                                 "last_published_at = GREATEST(sync_state.last_published_at, "
+                                 "EXCLUDED.last_published_at), "
+                                 "last_synced_at = EXCLUDED.last_synced_at",
+                                 (last_published_at, employer_hh_id))
+
+    @instrumented
+    def close_vanished_vacancies(self, employer_hh_id: int, vacancy_hh_ids: Iterable[int]) -> int:
+        """
+        Отмечает закрытыми (closed_at) открытые вакансии работодателя, которых нет среди vacancy_hh_ids -
+        полного списка актуальных вакансий работодателя. Возвращает количество закрытых вакансий.
+        """
+        with self.connection() as conn, conn.cursor() as cur:
+            cur.execute_prepared("UPDATE vacancies SET closed_at = now() "
+                                 "FROM employers "
+                                 "WHERE vacancies.employer_id = employers.employer_id "
+                                 "AND employers.employer_hh_id = %s "
+                                 "AND vacancies.closed_at IS NULL "
+                                 "AND vacancies.vacancy_hh_id <> ALL(%s::int[])",
+                                 (employer_hh_id, [int(vacancy_id) for vacancy_id in vacancy_hh_ids]))
+            return cur.rowcount
+
+    @instrumented
+    def apply_retention(self, months: int) -> int:
+        """
+        Политика хранения: удаляет вакансии, опубликованные раньше первого числа месяца, отстоящего
+        на months - 1 месяцев от текущего (хранятся текущий и months - 1 предыдущих месяцев).
+        При секционированной схеме старые секции удаляются целиком (DROP TABLE) без построчного DELETE.
+        Возвращает количество удаленных вакансий и пересчитывает статистику.
+        """
+        cutoff = month_start(date.today())
+        for _ in range(months - 1):
+            cutoff = month_start(cutoff.replace(day=1) - timedelta(days=1))
+        deleted = 0
+        with self.connection() as conn, conn.cursor() as cur:
+            if self.partitioned:
+                cur.execute("SELECT child.relname FROM pg_inherits "
+                            "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+                            "WHERE pg_inherits.inhparent = 'vacancies'::regclass")
+                for (name,) in cur.fetchall():
+                    match = PARTITION_NAME_RE.match(name)
+                    if match and date(int(match[1]), int(match[2]), 1) < cutoff:
+                        cur.execute(f"SELECT COUNT(*) FROM {name}")
+                        deleted += cur.fetchone()[0]
+                        cur.execute(f"DROP TABLE {name}")
+                        self.__partitions.discard(date(int(match[1]), int(match[2]), 1))
+            else:
+                cur.execute("DELETE FROM vacancies WHERE published_at < %s", (cutoff,))
+                deleted = cur.rowcount
+            # роли удаленных вакансий
+            cur.execute("DELETE FROM vacancy_professional_roles WHERE NOT EXISTS (SELECT 1 FROM vacancies "
+                        "WHERE vacancies.vacancy_hh_id = vacancy_professional_roles.vacancy_hh_id)")
+        self.refresh_stats()
+        return deleted
+
+    @instrumented
+    def refresh_stats(self):
+        """
+        Пересчитывает материализованные представления STATS_VIEWS.
+        Обновление выполняется CONCURRENTLY, поэтому не блокирует чтение статистики.
+        """
+        with self.connection() as conn, conn.cursor() as cur:
+            for name, _, _ in STATS_VIEWS:
+                cur.execute(f"REFRESH MATERIALIZED VIEW CONCURRENTLY {name}")
+
+    @instrumented
+    def get_companies_and_vacancies_count(self, date_from: date = None, date_to: date = None) -> list[dict]:
+        """
+        Количество вакансий каждой компании. Без периода читается из представления employer_vacancy_counts,
+        с периодом публикации date_from, date_to - считается по таблице vacancies.
+        """
+        condition, params = date_range_condition(date_from, date_to)
+        source = f"({employer_vacancy_counts_sql(condition)}) AS counts" if condition else "employer_vacancy_counts"
+        with self.connection() as conn, conn.cursor() as cur:
+            cur.execute_prepared(f"SELECT employers_name, vacancies_count FROM {source} "
+                                 f"ORDER BY vacancies_count DESC", params)
             data = cur.fetchall()
             data_dict = [{"employers_name": d[0], "total_vacancies_in_db": d[1]} for d in data]
         return data_dict
 
-    def get_all_vacancies(self) -> list[dict]:
-        with self.conn.cursor() as cur:
-            cur.execute(f"SELECT vacancies.name, employers.name, salary_from, salary_to,"
-                        f" currency, gross, vacancies.alternate_url FROM vacancies "
-                        f"JOIN employers USING(employer_id)")
+    @instrumented
+    def get_all_vacancies(self, date_from: date = None, date_to: date = None) -> list[dict]:
+        condition, params = date_range_condition(date_from, date_to)
+        where = f" WHERE {condition}" if condition else ""
+        with self.connection() as conn, conn.cursor() as cur:
+            cur.execute_prepared(f"SELECT vacancies.name, employers.name, salary_from, salary_to,"
+                                 f" currency, gross, vacancies.alternate_url FROM {VACANCIES_SQL} "
+                                 f"JOIN employers USING(employer_id){where}", params)
             data = cur.fetchall()
             data_dict = [{"vacancies_name": d[0], "employers_name": d[1], "salary_from": d[2],
                           "salary_to": d[3], "currency": d[4], "gross": d[5], "vacancies_alternate_url": d[6]}
                          for d in data]
         return data_dict
 
-    def get_avg_salary(self) -> list[dict]:
-        with self.conn.cursor() as cur:
-            cur.execute(f"SELECT AVG(salary_from), AVG(salary_to), currency, gross FROM vacancies "
-                        f"WHERE salary_from IS NOT NULL OR salary_to IS NOT NULL "
-                        f"GROUP BY currency, gross")
+    def iter_all_vacancies(self, after_id: int = 0, limit: int = None, itersize: int = ITERSIZE,
+                           date_from: date = None, date_to: date = None) -> Iterator[VacancyRecord]:
+        """
+        Генератор: возвращает вакансии с названием компании записями VacancyRecord в порядке vacancies_id.
+        Строки читаются серверным (именованным) курсором порциями по itersize, поэтому расход памяти
+        не зависит от размера таблицы. Для постраничной выборки передается vacancies_id последней
+        полученной записи в after_id и размер страницы в limit.
+        Соединение из пула занято, пока генератор не исчерпан или не закрыт.
+        """
+        condition, params = date_range_condition(date_from, date_to)
+        with self.connection() as conn, conn.cursor(name='iter_all_vacancies') as cur:
+            cur.itersize = itersize
+            # имя операции задается только на время запроса: между yield вызывающий код
+            # выполняет свои запросы, и они не должны учитываться как iter_all_vacancies
+            with operation_scope('iter_all_vacancies'):
+                cur.execute(f"SELECT vacancies.vacancies_id, vacancies.name, employers.name, salary_from, "
+                            f"salary_to, currency, gross, vacancies.alternate_url FROM {VACANCIES_SQL} "
+                            f"JOIN employers USING(employer_id) "
+                            f"WHERE vacancies.vacancies_id > %s{f' AND {condition}' if condition else ''} "
+                            f"ORDER BY vacancies.vacancies_id "
+                            f"LIMIT %s",
+                            (after_id, *params, limit))
+            for row in cur:
+                yield VacancyRecord._make(row)
+
+    @instrumented
+    def get_avg_salary(self, date_from: date = None, date_to: date = None) -> list[dict]:
+        """
+        Средние зарплаты в разрезе currency, gross. Без периода читаются из представления salary_stats,
+        с периодом публикации date_from, date_to - считаются по таблице vacancies.
+        """
+        condition, params = date_range_condition(date_from, date_to)
+        source = f"({salary_stats_sql(('currency', 'gross'), condition)}) AS stats" if condition else "salary_stats"
+        with self.connection() as conn, conn.cursor() as cur:
+            cur.execute_prepared(f"SELECT avg_salary_from, avg_salary_to, currency, gross FROM {source}", params)
             data = cur.fetchall()
             data_dict = [{"AVG(salary_from)": d[0], "AVG(salary_to)": d[1], "currency": d[2],
                           "gross": d[3]} for d in data]
         return data_dict
 
-    def get_vacancies_with_higher_salary(self) -> list[dict]:
+    @instrumented
+    def get_salary_stats(self, by_area: bool = False, by_experience: bool = False,
+                         date_from: date = None, date_to: date = None) -> list[dict]:
+        """
+        Статистика зарплат в разрезе currency, gross и, если заданы by_area/by_experience, area и experience:
+        количество вакансий с зарплатой, средние, медианы и квартили salary_from и salary_to.
+        Читается из предрассчитанного представления SALARY_STATS_VIEWS для нужного разреза,
+        а при заданном периоде публикации date_from, date_to - считается по таблице vacancies.
+        """
+        group_by = ('currency', 'gross') + (('area',) if by_area else ()) + (('experience',) if by_experience else ())
+        condition, params = date_range_condition(date_from, date_to)
+        view = f"({salary_stats_sql(group_by, condition)}) AS stats" if condition else SALARY_STATS_VIEWS[group_by]
+        salaries = ('salary_from', 'salary_to')
+        fields = ("vacancies_count",) + tuple(f"{stat}_{salary}" for salary in salaries
+                                              for stat in ('avg', 'median', 'p25', 'p75'))
+        with self.connection() as conn, conn.cursor() as cur:
+            cur.execute_prepared(f"SELECT {', '.join(group_by + fields)} FROM {view} "
+                                 f"ORDER BY {', '.join(group_by)}", params)
+            data = cur.fetchall()
+            data_dict = [dict(zip(group_by + fields, d)) for d in data]
+        return data_dict
+
+    @instrumented
+    def get_salary_stats_local(self, by_area: bool = False, by_experience: bool = False,
+                               date_from: date = None, date_to: date = None) -> list[dict]:
+        """
+        То же, что get_salary_stats, но агрегаты считаются на стороне клиента векторными операциями
+        pyarrow.compute по колонкам, выгруженным iter_vacancy_batches (без представлений в БД).
+        Квартили и медианы вычисляются линейной интерполяцией, как percentile_cont.
+        Значения возвращаются числами float.
+        """
+        require_pyarrow()
+        group_by = ('currency', 'gross') + (('area',) if by_area else ()) + (('experience',) if by_experience else ())
+        salaries = ('salary_from', 'salary_to')
+        columns = group_by + salaries
+        table = pyarrow.Table.from_batches(self.iter_vacancy_batches(columns, date_from, date_to),
+                                           schema=export_schema(columns))
+        compute = pyarrow.compute
+        table = table.filter(compute.or_(compute.is_valid(table['salary_from']), compute.is_valid(table['salary_to'])))
+        grouped = table.group_by(list(group_by)).aggregate(
+            [([], 'count_all')] + [(salary, aggregate) for salary in salaries for aggregate in ('mean', 'list')])
+        grouped = grouped.sort_by([(column, 'ascending') for column in group_by])
         data_dict = []
-        with self.conn.cursor() as cur:
-            cur.execute(f"SELECT AVG(salary_from), AVG(salary_to), currency, gross FROM vacancies "
-                        f"WHERE salary_from IS NOT NULL OR salary_to IS NOT NULL "
-                        f"GROUP BY currency, gross")
+        for row in range(grouped.num_rows):
+            stats = {column: grouped[column][row].as_py() for column in group_by}
+            stats['vacancies_count'] = grouped['count_all'][row].as_py()
+            for salary in salaries:
+                quantiles = compute.quantile(grouped[f'{salary}_list'][row].values, q=[0.5, 0.25, 0.75],
+                                             interpolation='linear').to_pylist()
+                stats[f'avg_{salary}'] = grouped[f'{salary}_mean'][row].as_py()
+                stats.update(zip((f'median_{salary}', f'p25_{salary}', f'p75_{salary}'), quantiles))
+            data_dict.append(stats)
+        return data_dict
+
+    @instrumented
+    def get_vacancies_with_higher_salary(self, date_from: date = None, date_to: date = None) -> list[dict]:
+        """
+        Вакансии, у которых salary_from и salary_to не ниже средних по группе (currency, gross).
+        Если среднее по группе не определено (нет ни одного значения), условие по нему не проверяется.
+        Средние считаются оконной функцией за один проход по таблице.
+        Как и прежде, результат содержит только группы с gross = True: группы с gross NULL/False
+        (gross = False при загрузке сохраняется как NULL) в результат не попадают.
+        При заданном периоде публикации date_from, date_to средние считаются по вакансиям периода.
+        """
+        condition, params = date_range_condition(date_from, date_to)
+        with self.connection() as conn, conn.cursor() as cur:
+            cur.execute_prepared(f"SELECT vacancies_id, name, salary_from, salary_to, currency, gross FROM ("
+                                 f"SELECT vacancies_id, name, salary_from, salary_to, currency, gross, "
+                                 f"AVG(salary_from) OVER salary_group AS avg_salary_from, "
+                                 f"AVG(salary_to) OVER salary_group AS avg_salary_to "
+                                 f"FROM {VACANCIES_SQL} "
+                                 f"WHERE currency IS NOT NULL AND gross IS TRUE"
+                                 f"{f' AND {condition}' if condition else ''} "
+                                 f"WINDOW salary_group AS (PARTITION BY currency, gross)) AS v "
+                                 f"WHERE (salary_from >= avg_salary_from OR avg_salary_from IS NULL) "
+                                 f"AND (salary_to >= avg_salary_to OR avg_salary_to IS NULL) "
+                                 f"ORDER BY currency, vacancies_id", params)
             data = cur.fetchall()
-            data_dict_1 = [{"AVG(salary_from)": d[0], "AVG(salary_to)": d[1], "currency": d[2],
-                            "gross": d[3]} for d in data]
-        for item in data_dict_1:
-            if not item["gross"]:
-                item["gross"] = 'null'
-            with self.conn.cursor() as cur:
-                cur.execute(f"SELECT vacancies_id, name, salary_from, salary_to, currency, gross FROM vacancies "
-                            f"WHERE (salary_from >= (SELECT AVG(salary_from) FROM vacancies "
-                            f"WHERE currency = '{item["currency"]}' AND gross = {item["gross"]} "
-                            f"GROUP BY currency, gross) "
-                            f"OR (SELECT AVG(salary_from) FROM vacancies "
-                            f"WHERE currency = '{item["currency"]}' AND gross = {item["gross"]} "
-                            f"GROUP BY currency, gross) IS NULL) "
-                            f"AND (salary_to >= (SELECT AVG(salary_to) FROM vacancies "
-                            f"WHERE currency = '{item["currency"]}' AND gross = {item["gross"]} "
-                            f"GROUP BY currency, gross) "
-                            f"OR (SELECT AVG(salary_to) FROM vacancies "
-                            f"WHERE currency = '{item["currency"]}' AND gross = {item["gross"]} "
-                            f"GROUP BY currency, gross) IS NULL) "
-                            f"AND currency = '{item["currency"]}' AND gross = {item["gross"]}")
-                data = cur.fetchall()
-                data_dict_2 = [{"vacancies_id": d[0], "vacancies_name": d[1], "salary_from": d[2], "salary_to": d[3],
-                                "currency": d[4], "gross": d[5]} for d in data]
-
-            data_dict.extend(data_dict_2)
+            data_dict = [{"vacancies_id": d[0], "vacancies_name": d[1], "salary_from": d[2], "salary_to": d[3],
+                          "currency": d[4], "gross": d[5]} for d in data]
         return data_dict
 
-    def get_vacancies_with_keyword(self, keyword: str) -> list[dict]:
-        keyword_title = keyword.lower().title()
-        with self.conn.cursor() as cur:
-            cur.execute(f"SELECT vacancies.name, employers.name, vacancies.alternate_url, "
-                        f"vacancies.professional_roles, vacancies.snippet_requirement, "
-                        f"vacancies.snippet_responsibility "
-                        f"FROM vacancies JOIN employers USING(employer_id) "
-                        f"WHERE vacancies.name LIKE '%{keyword}%' OR "
-                        f"vacancies.name LIKE '%{keyword_title}%' OR "
-                        f"vacancies.professional_roles LIKE '%{keyword}%' OR "
-                        f"vacancies.professional_roles LIKE '%{keyword_title}%' OR "
-                        f"vacancies.snippet_requirement LIKE '%{keyword}%' OR "
-                        f"vacancies.snippet_responsibility LIKE '%{keyword}%' OR "
-                        f"vacancies.snippet_requirement LIKE '%{keyword_title}%' OR "
-                        f"vacancies.snippet_responsibility LIKE '%{keyword_title}%' ")
+    @instrumented
+    def get_vacancies_with_keyword(self, keyword: str | list[str], limit: int = None, offset: int = 0,
+                                   date_from: date = None, date_to: date = None) -> list[dict]:
+        """
+        Полнотекстовый поиск вакансий по одному или нескольким словам (достаточно совпадения любого из них).
+        Результат отсортирован по релевантности (ts_rank), limit и offset задают страницу результата.
+        Пустой список слов - ValueError.
+        """
+        keywords = [keyword] if isinstance(keyword, str) else list(keyword)
+        if not keywords:
+            raise ValueError("Не переданы слова для поиска вакансий")
+        query_sql = " || ".join(f"plainto_tsquery('{config}', %s)"
+                                for _ in keywords for config in SEARCH_CONFIGS)
+        query_params = [kw for kw in keywords for _ in SEARCH_CONFIGS]
+        condition, params = date_range_condition(date_from, date_to)
+        # OFFSET 0 не дает встроить подзапрос в основной запрос: в общем плане подготовленного запроса
+        # tsquery иначе вычислялся бы заново для каждой строки
+        with self.connection() as conn, conn.cursor() as cur:
+            cur.execute_prepared(f"SELECT vacancies.name, employers.name, vacancies.alternate_url, "
+                                 f"vacancies.professional_roles, vacancies.snippet_requirement, "
+                                 f"vacancies.snippet_responsibility "
+                                 f"FROM {VACANCIES_SQL} JOIN employers USING(employer_id), "
+                                 f"(SELECT {query_sql} AS q OFFSET 0) AS query "
+                                 f"WHERE vacancies.search_vector @@ query.q{f' AND {condition}' if condition else ''} "
+                                 f"ORDER BY ts_rank(vacancies.search_vector, query.q) DESC, vacancies.vacancies_id "
+                                 f"LIMIT %s OFFSET %s",
+                                 (*query_params, *params, limit, offset))
             data = cur.fetchall()
             data_dict = [{"vacancies_name": d[0], "employers_name": d[1], "vacancies_alternate_url": d[2],
                           "vacancies_professional_roles": d[3], "vacancies_snippet_requirement": d[4],
                           "vacancies_snippet_responsibility": d[5]} for d in data]
             return data_dict
+
+    def iter_vacancy_batches(self, columns: Iterable[str] = None, date_from: date = None, date_to: date = None,
+                             block_size: int = EXPORT_BLOCK_SIZE) -> Iterator['pyarrow.RecordBatch']:
+        """
+        Генератор: выгружает вакансии с данными компаний колонками columns (по умолчанию все EXPORT_COLUMNS),
+        опубликованные в период date_from, date_to, порциями pyarrow.RecordBatch.
+        Строки передаются сервером командой COPY ... TO STDOUT (CSV) через канал (pipe) и разбираются
+        потоковым CSV-читателем pyarrow сразу в колонки заданных типов, без объектов Python на каждую строку.
+        Расход памяти ограничен размером порции block_size.
+        """
+        require_pyarrow()
+        columns = list(columns or EXPORT_COLUMNS)
+        schema = export_schema(columns)
+        condition, params = date_range_condition(date_from, date_to)
+        where = f" WHERE {condition}" if condition else ""
+        select = ", ".join(f"{EXPORT_COLUMNS[column][0]} AS {column}" for column in columns)
+        with self.connection() as conn, conn.cursor() as cur:
+            query = cur.mogrify(f"SELECT {select} FROM {VACANCIES_SQL} JOIN employers USING(employer_id){where} "
+                                f"ORDER BY vacancies.vacancies_id", params).decode()
+            read_fd, write_fd = os.pipe()
+            reader, writer = os.fdopen(read_fd, 'rb'), os.fdopen(write_fd, 'wb')
+            errors = []
+
+            def copy():
+                # COPY выполняется в отдельном потоке и только на это время учитывается как операция
+                # iter_vacancy_batches (между yield вызывающий код выполняет свои запросы)
+                try:
+                    with self.metrics.timer('db_statement_seconds', operation='iter_vacancy_batches',
+                                            statement='COPY'):
+                        cur.copy_expert(f"COPY ({query}) TO STDOUT WITH (FORMAT csv)", writer)
+                except Exception as e:
+                    errors.append(e)
+                finally:
+                    try:
+                        writer.close()
+                    except BrokenPipeError:
+                        # генератор закрыт до окончания выгрузки, читатель канала уже закрыт
+                        pass
+
+            thread = threading.Thread(target=copy, daemon=True)
+            thread.start()
+            try:
+                # пустой результат COPY CSV-читатель не принимает, поэтому сначала ждем первые данные
+                batches = pyarrow.csv.open_csv(
+                    reader,
+                    read_options=pyarrow.csv.ReadOptions(column_names=columns, block_size=block_size),
+                    parse_options=pyarrow.csv.ParseOptions(newlines_in_values=True),
+                    convert_options=pyarrow.csv.ConvertOptions(
+                        column_types=schema, null_values=[''], strings_can_be_null=True,
+                        quoted_strings_can_be_null=False, true_values=['t'], false_values=['f'])
+                ) if reader.peek(1) else ()
+                for batch in batches:
+                    self.metrics.inc('db_rows_exported_total', batch.num_rows)
+                    yield batch
+            finally:
+                reader.close()
+                thread.join()
+            if errors:
+                raise errors[0]
+
+    @instrumented
+    def export_vacancies(self, path: str, columns: Iterable[str] = None, date_from: date = None,
+                         date_to: date = None, export_format: str = 'parquet') -> int:
+        """
+        Выгружает вакансии (см. iter_vacancy_batches) в файл path в формате export_format:
+        'parquet' - Parquet, 'arrow' - файл Arrow IPC. Каждая порция записывается сразу,
+        поэтому весь результат в памяти не собирается. Возвращает количество выгруженных вакансий.
+        """
+        require_pyarrow()
+        if export_format not in EXPORT_FORMATS:
+            raise ValueError(f"Неизвестный формат выгрузки: {export_format}. Допустимые форматы: {EXPORT_FORMATS}")
+        columns = list(columns or EXPORT_COLUMNS)
+        schema = export_schema(columns)
+        rows = 0
+        if export_format == 'parquet':
+            writer = pyarrow.parquet.ParquetWriter(path, schema)
+        else:
+            writer = pyarrow.ipc.new_file(path, schema)
+        with writer:
+            for batch in self.iter_vacancy_batches(columns, date_from, date_to):
+                writer.write_batch(batch)
+                rows += batch.num_rows
+        return rows
+
@@ -0,0 +1,92 @@
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+from urllib.parse import urlencode
+
+CACHE_PATH = 'hh_cache.sqlite3'  # файл кэша ответов API
+CACHE_TTL = 3600  # время (сек), в течение которого ответ используется без обращения к API
+CACHE_MAX_ENTRIES = 10000  # при превышении удаляются давно не использованные ответы (LRU)
+
+# Сохраненный ответ: тело, заголовки для условного запроса и признак свежести (не старше ttl)
+CacheEntry = namedtuple('CacheEntry', ['key', 'body', 'etag', 'last_modified', 'fresh'])
+
+
+class ResponseCache:
+    """
+    Кэш ответов API в файле SQLite.
+    Ключ - URL и параметры запроса. Ответ младше ttl секунд используется без обращения к API,
+    устаревший ответ проверяется условным запросом (If-None-Match / If-Modified-Since):
+    при ответе 304 используется сохраненное тело. Количество записей ограничено max_entries,
+    лишние записи удаляются в порядке давности последнего использования.
+    В режиме offline (воспроизведение) API не запрашивается, используются только сохраненные
+    ответы независимо от их возраста.
+    Счетчики hits, misses, revalidated, stored, evicted доступны через stats().
+    Объект можно использовать из нескольких потоков.
+    """
+
+    def __init__(self, path: str = CACHE_PATH, ttl: float = CACHE_TTL, max_entries: int = CACHE_MAX_ENTRIES,
+                 offline: bool = False):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.offline = offline
+        self.__lock = threading.Lock()
+        self.__counters = {"hits": 0, "misses": 0, "revalidated": 0, "stored": 0, "evicted": 0}
+        self.__conn = sqlite3.connect(path, check_same_thread=False)
+        with self.__conn:
+            self.__conn.execute("CREATE TABLE IF NOT EXISTS responses ("
+                                "key TEXT PRIMARY KEY, "
+                                "body BLOB NOT NULL, "
+                                "etag TEXT, "
+                                "last_modified TEXT, "
+                                "stored_at REAL NOT NULL, "
+                                "accessed_at REAL NOT NULL)")
+            self.__conn.execute("CREATE INDEX IF NOT EXISTS responses_accessed_at_idx ON responses (accessed_at)")
+
+    @staticmethod
+    def make_key(url: str, params: dict) -> str:
+        return f"{url}?{urlencode(sorted(params.items()))}"
+
+    def count(self, counter: str):
+        with self.__lock:
+            self.__counters[counter] += 1
+
+    def stats(self) -> dict:
+        with self.__lock:
+            return dict(self.__counters)
+
+    def get(self, url: str, params: dict) -> CacheEntry | None:
+        """Возвращает сохраненный ответ (свежий или устаревший) или None и отмечает его использование."""
+        key = self.make_key(url, params)
+        now = time.time()
+        with self.__lock, self.__conn:
+            row = self.__conn.execute("SELECT body, etag, last_modified, stored_at FROM responses WHERE key = ?",
+                                      (key,)).fetchone()
+            if row is None:
+                return None
+            self.__conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+        body, etag, last_modified, stored_at = row
+        return CacheEntry(key, body, etag, last_modified, now - stored_at < self.ttl)
+
+    def put(self, url: str, params: dict, body: bytes, etag: str = None, last_modified: str = None):
+        """Сохраняет ответ и удаляет давно не использованные записи сверх max_entries."""
+        key = self.make_key(url, params)
+        now = time.time()
+        with self.__lock, self.__conn:
+            self.__conn.execute("INSERT OR REPLACE INTO responses "
+                                "(key, body, etag, last_modified, stored_at, accessed_at) "
+                                "VALUES (?, ?, ?, ?, ?, ?)",
+                                (key, body, etag, last_modified, now, now))
+            evicted = self.__conn.execute("DELETE FROM responses WHERE key IN ("
+                                          "SELECT key FROM responses ORDER BY accessed_at DESC "
+                                          "LIMIT -1 OFFSET ?)", (self.max_entries,)).rowcount
+            self.__counters["stored"] += 1
+            self.__counters["evicted"] += evicted
+
+    def refresh(self, entry: CacheEntry):
+        """Продлевает срок свежести ответа, подтвержденного API (ответ 304)."""
+        with self.__lock, self.__conn:
+            self.__conn.execute("UPDATE responses SET stored_at = ? WHERE key = ?", (time.time(), entry.key))
+
+    def close(self):
+        self.__conn.close()
@@ -1,6 +1,11 @@
-from src.parser import HH
+from src.parser import HH, create_session, iter_pages_concurrently, MAX_WORKERS
 from dotenv import load_dotenv
 from src.dbmanager import DBManager
+from src.http_cache import ResponseCache, CACHE_TTL
+from src.metrics import default_metrics
+from src.sync import sync_employers
+from src.crawler import run_crawl, CRAWL_WORKERS
+import math
 import os
 
 url_area = 'https://api.hh.ru/areas'
@@ -16,31 +21,88 @@ db_config = {
     'port': os.getenv('POSTGRES_PORT'),
     'dbname': os.getenv('POSTGRES_DB')
 }
+# Схема новой БД: таблица vacancies, секционированная по месяцам даты публикации
+db_partitioned = os.getenv('DB_PARTITIONED', '') == '1'
+# Политика хранения: количество месяцев, за которые хранятся вакансии (если не задано, хранятся все)
+retention_months = os.getenv('VACANCIES_RETENTION_MONTHS')
+# Режим загрузки вакансий: 'full' - полная загрузка при каждом запуске,
+# 'incremental' - загрузка только новых и изменившихся вакансий (см. src/sync.py),
+# 'crawl' - полная загрузка несколькими процессами через очередь в БД (см. src/crawler.py)
+sync_mode = os.getenv('SYNC_MODE', 'full')
+# Количество работодателей (с наибольшим числом открытых вакансий), вакансии которых загружаются
+employers_count = int(os.getenv('EMPLOYERS_COUNT', 10))
+# В режиме 'crawl': количество процессов и продолжение прерванного обхода вместо нового
+crawl_workers = int(os.getenv('CRAWL_WORKERS', CRAWL_WORKERS))
+crawl_resume = os.getenv('CRAWL_RESUME', '') == '1'
+# В режиме 'incremental' отмечать закрытыми вакансии, исчезнувшие с hh.ru
+sync_close_vanished = os.getenv('SYNC_CLOSE_VANISHED', '') == '1'
+# Кэш ответов API: путь к файлу кэша (если не задан, кэш не используется), время жизни ответа
+# и режим воспроизведения без обращения к API
+http_cache_path = os.getenv('HTTP_CACHE_PATH')
+http_cache_ttl = float(os.getenv('HTTP_CACHE_TTL', CACHE_TTL))
+http_cache_offline = os.getenv('HTTP_CACHE_OFFLINE', '') == '1'
+# Метрики загрузки и запросов: формат вывода ('json' или 'prometheus', если не задан - метрики не выводятся),
+# файл для записи (если не задан - вывод на экран) и сбор планов EXPLAIN ANALYZE для SELECT-запросов
+metrics_format = os.getenv('METRICS_FORMAT')
+metrics_path = os.getenv('METRICS_PATH')
+db_explain = os.getenv('DB_EXPLAIN', '') == '1'
+
+
+def export_metrics():
+    """Выводит накопленные метрики в формате metrics_format на экран или в файл metrics_path"""
+    if metrics_format not in ('json', 'prometheus'):
+        return
+    text = default_metrics.to_json() if metrics_format == 'json' else default_metrics.to_prometheus()
+    if metrics_path:
+        with open(metrics_path, 'w', encoding='utf-8') as file:
+            file.write(text)
+    else:
+        print(text)
 
 
 def main():
-    db = DBManager(db_config)
+    db = DBManager(db_config, explain=db_explain, partitioned=db_partitioned)
+    session = create_session(MAX_WORKERS)  # общий пул keep-alive соединений для всех запросов к API
+    cache = None
+    if http_cache_path:
+        cache = ResponseCache(http_cache_path, http_cache_ttl, offline=http_cache_offline)
     end = False  # флаг выхода из программы
     while not end:  # пока не конец программы
         print("Получаем список работодателей, отсортированных по количеству открытых вакансий")
         params = {"only_with_vacancies": True, "sort_by": "by_vacancies_open", "page": 0, "per_page": 100}
-        employers = HH(url_employers, params)
-        print(employers.load_data_via_api(1))
-        print("Получаем топ 10 работодателей по количеству открытых вакансий")
-        employers_lst = employers.data_lst[:10]
+        employers = HH(url_employers, params, session, cache=cache)
+        print(employers.load_data_via_api(math.ceil(employers_count / params['per_page'])))
+        print(f"Получаем топ {employers_count} работодателей по количеству открытых вакансий")
+        employers_lst = employers.data_lst[:employers_count]
         #вносим полученные данные в таблицу
         db.insert_data('employers', employers_lst)
 
-        print("Для каждого из 10 работодателей получаем список вакансий (ограничение API - максимум 2000 вакансий")
-        for emplr in employers_lst:
-            params = {"page": 0, "per_page": 100}
-            employer_vacancies = HH(emplr['vacancies_url'], params)
-            print("Для работодателя ", emplr["name"])
-            print(employer_vacancies.load_data_via_api(1))
-            employer_vacancies_lst = employer_vacancies.data_lst
-            # вносим полученные данные в таблицу
-            print(f"Вносим в таблицу {len(employer_vacancies_lst)} вакансий")
-            db.insert_data('vacancies', employer_vacancies_lst)
+        print(f"Для каждого из {employers_count} работодателей получаем список вакансий "
+              f"(ограничение API - максимум 2000 вакансий")
+        if sync_mode == 'crawl':
+            crawl_status = run_crawl(db_config, employers_lst, url_vacancies, crawl_workers, resume=crawl_resume)
+            print(f"Задач выполнено {crawl_status['done']}, разделено {crawl_status['split']}, "
+                  f"с ошибкой {crawl_status['failed']}, загружено вакансий {crawl_status['loaded']}")
+        elif sync_mode == 'incremental':
+            sync_result = sync_employers(db, employers_lst, session, close_vanished=sync_close_vanished,
+                                         cache=cache)
+            for name, stats in sync_result.items():
+                print(f"Для работодателя {name}: найдено {stats['found']}, загружено {stats['loaded']}, "
+                      f"закрыто {stats['closed']} вакансий")
+        else:
+            # запросы вакансий всех работодателей выполняются параллельно,
+            # страницы вносятся в таблицу пакетами по мере получения, без накопления в памяти
+            employers_vacancies = [HH(emplr['vacancies_url'], {"page": 0, "per_page": 100}, session,
+                                      cache=cache)
+                                   for emplr in employers_lst]
+            pages = iter_pages_concurrently(employers_vacancies, 1, MAX_WORKERS)
+            db.insert_data('vacancies', (item for _, page in pages for item in page['items']))
+            for emplr, employer_vacancies in zip(employers_lst, employers_vacancies):
+                print("Для работодателя ", emplr["name"])
+                print(employer_vacancies.found_message())
+
+        if retention_months:
+            print(f"Удалено вакансий старше {retention_months} мес.: {db.apply_retention(int(retention_months))}")
 
         print("--------get_companies_and_vacancies_count--------")
         data_lst = db.get_companies_and_vacancies_count()
@@ -60,6 +122,14 @@ def main():
         [print(item, '\n') for item in data_lst]
 
         end = True
+    if cache is not None:
+        print("Кэш ответов API:", cache.stats())
+        cache.close()
+    if db_explain:
+        for operation, plans in db.explain_plans.items():
+            print(f"EXPLAIN ANALYZE {operation}: выполнение {plans[-1][0]['Execution Time']} мс")
+    export_metrics()
+    session.close()
     db.close_conn()
 
 
@@ -0,0 +1,103 @@
+import json
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable
+
+
+def escape_label(value) -> str:
+    """Экранирует значение метки для текстового формата Prometheus."""
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class Metrics:
+    """
+    Потокобезопасные счетчики и таймеры для инструментирования загрузки и запросов.
+    Счетчик (inc) накапливает сумму значений, таймер (observe, timer) - количество измерений,
+    суммарное и максимальное время. Метрики различаются именем и набором меток (labels).
+    callback(kind, name, value, labels) - необязательный обработчик, вызывается на каждое событие
+    ('counter' или 'timer'), например для передачи метрик во внешнюю систему.
+    Выгрузка: snapshot() - словарь, to_json() - JSON, to_prometheus() - текстовый формат Prometheus.
+    """
+
+    def __init__(self, callback: Callable[[str, str, float, dict], None] = None):
+        self.callback = callback
+        self.__lock = threading.Lock()
+        self.__counters = {}
+        self.__timers = {}
+
+    @staticmethod
+    def _key(name: str, labels: dict) -> tuple:
+        # Значения меток приводятся к строкам, иначе ключи с метками разных типов
+        # (например, status=200 и status='error') нельзя сравнить при сортировке
+        return name, tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+    def inc(self, name: str, value: float = 1, **labels):
+        key = self._key(name, labels)
+        with self.__lock:
+            self.__counters[key] = self.__counters.get(key, 0) + value
+        if self.callback is not None:
+            self.callback('counter', name, value, labels)
+
+    def observe(self, name: str, seconds: float, **labels):
+        key = self._key(name, labels)
+        with self.__lock:
+            count, total, maximum = self.__timers.get(key, (0, 0.0, 0.0))
+            self.__timers[key] = (count + 1, total + seconds, max(maximum, seconds))
+        if self.callback is not None:
+            self.callback('timer', name, seconds, labels)
+
+    @contextmanager
+    def timer(self, name: str, **labels):
+        """Контекстный менеджер: измеряет время выполнения блока."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def reset(self):
+        with self.__lock:
+            self.__counters.clear()
+            self.__timers.clear()
+
+    def snapshot(self) -> dict:
+        """Возвращает {'counters': [...], 'timers': [...]} с текущими значениями метрик."""
+        with self.__lock:
+            counters = dict(self.__counters)
+            timers = dict(self.__timers)
+        return {
+            "counters": [{"name": name, "labels": dict(labels), "value": value}
+                         for (name, labels), value in sorted(counters.items())],
+            "timers": [{"name": name, "labels": dict(labels), "count": count, "sum_seconds": total,
+                        "max_seconds": maximum, "avg_seconds": total / count}
+                       for (name, labels), (count, total, maximum) in sorted(timers.items())],
+        }
+
+    def to_json(self) -> str:
+        return json.dumps(self.snapshot(), ensure_ascii=False, indent=2)
+
+    def to_prometheus(self) -> str:
+        """Метрики в текстовом формате Prometheus: счетчики и пары *_count / *_sum для таймеров."""
+        def labels_str(labels: dict) -> str:
+            if not labels:
+                return ''
+            return "{" + ",".join(f'{key}="{escape_label(value)}"' for key, value in labels.items()) + "}"
+
+        snapshot = self.snapshot()
+        lines = []
+        for name in sorted({counter["name"] for counter in snapshot["counters"]}):
+            lines.append(f"# TYPE {name} counter")
+            lines.extend(f"{name}{labels_str(counter['labels'])} {counter['value']}"
+                         for counter in snapshot["counters"] if counter["name"] == name)
+        for name in sorted({timer["name"] for timer in snapshot["timers"]}):
+            lines.append(f"# TYPE {name} summary")
+            for timer in snapshot["timers"]:
+                if timer["name"] == name:
+                    lines.append(f"{name}_count{labels_str(timer['labels'])} {timer['count']}")
+                    lines.append(f"{name}_sum{labels_str(timer['labels'])} {timer['sum_seconds']}")
+        return "\n".join(lines) + "\n"
+
+
+# Общий объект метрик, который по умолчанию используют HH и DBManager
+default_metrics = Metrics()
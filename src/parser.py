@@ -1,16 +1,43 @@
 from abc import ABC, abstractmethod
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Iterator
+from urllib.parse import urlparse
+from src.http_cache import ResponseCache
+from src.metrics import Metrics, default_metrics
 from src.my_exeption import RequestErrorException
+import json
 import requests
+import time
+
+MAX_WORKERS = 8  # ограничение количества одновременных запросов к API
+MAX_RETRIES = 5  # количество повторов запроса при 429/503 и ошибках соединения
+BACKOFF_FACTOR = 0.5  # базовая пауза (сек) между повторами, удваивается с каждой попыткой
+RETRY_STATUS_CODES = (429, 503)
+
+
+def create_session(pool_size: int = MAX_WORKERS) -> requests.Session:
+    """
+    Создает requests.Session с пулом keep-alive соединений на pool_size соединений.
+    Одну сессию можно использовать для нескольких объектов HH.
+    """
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
 
 
 class Parser(ABC):
     """
-    Абстрактный класс для работы с API различных сайтов по поиску вакансий
+    Абстрактный класс для работы с API различных сайтов по поиску вакансий.
+    cache - необязательный кэш ответов API (ResponseCache)
     """
 
-    def __init__(self, url: str, params: dict):
+    def __init__(self, url: str, params: dict, cache: ResponseCache = None):
         self.params = params
         self.url = url
+        self.cache = cache
 
     @abstractmethod
     def load_data_via_api(self, params_for_load_data: dict):
@@ -25,14 +52,29 @@ class HH(Parser):
         Методы:
             load_data_via_api(self, keywords): Метод получает список данных, по запросу к API,
                                             используя указанное максимальное количество страниц.
-                                            По умолчанию 20 страниц;
+                                            По умолчанию 20 страниц. Страницы после первой
+                                            запрашиваются параллельно;
+            iter_pages(self, pages_max): Генератор, возвращающий элементы постранично,
+                                            без накопления в __data_lst;
+            iter_items(self, pages_max): Генератор, возвращающий элементы по одному;
+        Если передан cache (ResponseCache), ответы API кэшируются на диске.
+        Время и количество запросов, объем ответов, время разбора JSON, количество страниц
+        и элементов учитываются в metrics (по умолчанию общий src.metrics.default_metrics).
 
     """
     __data_lst: list[dict]
 
-    def __init__(self, url: str, params: dict):
+    def __init__(self, url: str, params: dict, session: requests.Session = None,
+                 max_retries: int = MAX_RETRIES, backoff_factor: float = BACKOFF_FACTOR,
+                 cache: ResponseCache = None, metrics: Metrics = None):
         self.__data_lst = []
-        super().__init__(url, params)
+        self.__found = 'Что-то пошло не так!'
+        self.session = session if session is not None else create_session()
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.metrics = metrics if metrics is not None else default_metrics
+        self.endpoint = urlparse(url).path
+        super().__init__(url, params, cache)
 
     def __repr__(self):
         return f"<{self.__class__}, {self.__dict__}>"
@@ -45,34 +87,149 @@ class HH(Parser):
 
     @property
     def data_lst(self) -> list[dict]:
-        data_lst = []
-        for item in self.__data_lst:
-            data_lst.append(item)
-        return data_lst
+        return self.__data_lst.copy()
+
+    def _decode(self, body: bytes) -> dict:
+        """Разбирает JSON страницы ответа и учитывает ее в метриках."""
+        with self.metrics.timer('json_decode_seconds', endpoint=self.endpoint):
+            data = json.loads(body)
+        self.metrics.inc('pages_total', endpoint=self.endpoint)
+        self.metrics.inc('items_total', len(data.get('items', ())), endpoint=self.endpoint)
+        return data
 
-    def load_data_via_api(self, pages_max=20) -> str:
+    def _count_cache(self, result: str):
+        self.cache.count(result)
+        self.metrics.inc('http_cache_total', result=result)
+
+    def _get_page(self, page: int) -> dict:
         """
-        Метод получает список данных, по запросу к API, используя указанное максимальное количество страниц.
-        По умолчанию 20 страниц. Добавляет данные в self.__data_lst
-        Возвращает строку: 'По запросу найдено {found} элементов'
+        Запрашивает страницу page и возвращает разобранный JSON ответа.
+        При ответах 429/503 и ошибках соединения повторяет запрос с экспоненциальной паузой,
+        учитывая заголовок Retry-After.
+        Если задан кэш, свежий ответ берется из кэша, устаревший - проверяется условным запросом.
         """
-        found = 'Что-то пошло не так!'
-        pages = 1
-        while self.params['page'] < pages:
-            if self.params['page'] >= pages_max:
-                break
+        params = {**self.params, 'page': page}
+        entry = None
+        headers = {}
+        if self.cache is not None:
+            entry = self.cache.get(self.url, params)
+            if entry is not None and (entry.fresh or self.cache.offline):
+                self._count_cache("hits")
+                return self._decode(entry.body)
+            self._count_cache("misses")
+            if self.cache.offline:
+                raise RequestErrorException(f"Ответ на запрос {self.cache.make_key(self.url, params)} "
+                                            f"отсутствует в кэше (режим offline)")
+            if entry is not None and entry.etag:
+                headers['If-None-Match'] = entry.etag
+            if entry is not None and entry.last_modified:
+                headers['If-Modified-Since'] = entry.last_modified
+        for attempt in range(self.max_retries + 1):
+            delay = self.backoff_factor * 2 ** attempt
+            start = time.perf_counter()
             try:
-                response = requests.get(self.url, self.params)
+                response = self.session.get(self.url, params=params, headers=headers)
             except requests.exceptions.ConnectionError as e:
                 print("ConnectionError ", e)
+                self.metrics.inc('http_requests_total', endpoint=self.endpoint, status='error')
             else:
+                self.metrics.observe('http_request_seconds', time.perf_counter() - start, endpoint=self.endpoint)
+                self.metrics.inc('http_requests_total', endpoint=self.endpoint, status=response.status_code)
+                self.metrics.inc('http_response_bytes_total', len(response.content), endpoint=self.endpoint)
+                if response.status_code == 304 and entry is not None:
+                    self.cache.refresh(entry)
+                    self._count_cache("revalidated")
+                    return self._decode(entry.body)
                 if response.status_code == 200:
-                    found = response.json()['found']
-                    page = response.json()['page']
-                    pages = response.json()['pages']
-                    items = response.json()['items']
-                    self.__data_lst.extend(items)
-                    self.params['page'] = page + 1
-                else:
-                    raise RequestErrorException(f"**{response.status_code}, **{response.json()}")
-        return f"По запросу найдено {found} элементов"
+                    if self.cache is not None:
+                        self.cache.put(self.url, params, response.content,
+                                       response.headers.get('ETag'), response.headers.get('Last-Modified'))
+                    return self._decode(response.content)
+                if response.status_code not in RETRY_STATUS_CODES:
+                    raise RequestErrorException(f"**{response.status_code}, **{response.text}")
+                retry_after = response.headers.get('Retry-After')
+                if retry_after and retry_after.isdigit():
+                    delay = max(delay, int(retry_after))
+            if attempt < self.max_retries:
+                time.sleep(delay)
+        raise RequestErrorException(f"Не удалось получить страницу {page} по запросу {self.url} "
+                                    f"за {self.max_retries + 1} попыток")
+
+    def _register_page(self, data: dict):
+        """Запоминает количество найденных элементов и номер следующей страницы"""
+        self.__found = data['found']
+        self.params['page'] = max(self.params['page'], data['page'] + 1)
+
+    def _add_items(self, items: list[dict]):
+        """Добавляет элементы полученной страницы в self.__data_lst"""
+        self.__data_lst.extend(items)
+
+    def iter_pages(self, pages_max=20, max_workers=MAX_WORKERS) -> Iterator[list[dict]]:
+        """
+        Генератор: возвращает списки элементов постранично, по мере получения ответов API.
+        Данные не сохраняются в self.__data_lst, поэтому расход памяти не зависит от объема результата.
+        """
+        for _, data in iter_pages_concurrently([self], pages_max, max_workers):
+            yield data['items']
+
+    def iter_items(self, pages_max=20, max_workers=MAX_WORKERS) -> Iterator[dict]:
+        """Генератор: возвращает элементы по одному, по мере получения страниц."""
+        for items in self.iter_pages(pages_max, max_workers):
+            yield from items
+
+    def load_data_via_api(self, pages_max=20, max_workers=MAX_WORKERS) -> str:
+        """
+        Метод получает список данных, по запросу к API, используя указанное максимальное количество страниц.
+        По умолчанию 20 страниц. Первая страница запрашивается для определения количества страниц,
+        остальные - параллельно, не более max_workers запросов одновременно.
+        Добавляет данные в self.__data_lst
+        Возвращает строку: 'По запросу найдено {found} элементов'
+        """
+        return load_data_concurrently([self], pages_max, max_workers)[0]
+
+    def found_message(self) -> str:
+        return f"По запросу найдено {self.__found} элементов"
+
+
+def iter_pages_concurrently(parsers: list[HH], pages_max=20,
+                            max_workers=MAX_WORKERS) -> Iterator[tuple[HH, dict]]:
+    """
+    Генератор: загружает страницы для нескольких объектов HH через общий пул из max_workers потоков
+    и возвращает пары (объект HH, JSON страницы) в порядке получения ответов.
+    Первая страница каждого запроса определяет количество страниц, остальные страницы
+    ставятся в очередь после нее. В работе одновременно не более max_workers запросов,
+    поэтому, пока вызывающий код обрабатывает страницу, следующие уже загружаются,
+    а в памяти находится ограниченное число страниц.
+    """
+    tasks = deque((parser, parser.params['page'], True) for parser in parsers
+                  if parser.params['page'] < pages_max)
+    in_flight = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        while tasks or in_flight:
+            while tasks and len(in_flight) < max_workers:
+                parser, page, first = tasks.popleft()
+                in_flight[executor.submit(parser._get_page, page)] = (parser, first)
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                parser, first = in_flight.pop(future)
+                data = future.result()
+                if first:
+                    tasks.extend((parser, page, False) for page in range(data['page'] + 1,
+                                                                         min(data['pages'], pages_max)))
+                parser._register_page(data)
+                yield parser, data
+
+
+def load_data_concurrently(parsers: list[HH], pages_max=20, max_workers=MAX_WORKERS) -> list[str]:
+    """
+    Загружает данные для нескольких объектов HH одновременно и сохраняет их в объектах.
+    Порядок элементов внутри каждого объекта совпадает с порядком страниц.
+    Возвращает список строк 'По запросу найдено {found} элементов' для каждого объекта.
+    """
+    pages = {parser: {} for parser in parsers}
+    for parser, data in iter_pages_concurrently(parsers, pages_max, max_workers):
+        pages[parser][data['page']] = data['items']
+    for parser, parser_pages in pages.items():
+        for page in sorted(parser_pages):
+            parser._add_items(parser_pages[page])
+    return [parser.found_message() for parser in parsers]
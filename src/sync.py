@@ -0,0 +1,70 @@
+from datetime import datetime
+
+import requests
+
+from src.dbmanager import DBManager
+from src.http_cache import ResponseCache
+from src.parser import HH, iter_pages_concurrently, MAX_WORKERS
+
+PER_PAGE = 100  # максимальный размер страницы API hh.ru
+PAGES_MAX = 20  # API hh.ru отдает не более 2000 элементов по одному запросу
+
+
+def parse_published_at(value: str) -> datetime:
+    """Разбирает дату публикации из ответа API hh.ru, например '2024-06-10T12:00:00+0300'."""
+    return datetime.strptime(value, '%Y-%m-%dT%H:%M:%S%z')
+
+
+def sync_employers(db: DBManager, employers: list[dict], session: requests.Session = None,
+                   pages_max=PAGES_MAX, close_vanished=False, max_workers=MAX_WORKERS,
+                   cache: ResponseCache = None) -> dict:
+    """
+    Инкрементальная синхронизация вакансий работодателей.
+    Для каждого работодателя запрашиваются только вакансии, опубликованные начиная с сохраненной
+    в sync_state отметки (параметр date_from), полученные вакансии вносятся в таблицу в режиме
+    'upsert' - добавляются новые и обновляются изменившиеся. После загрузки отметка сдвигается
+    на дату самой новой полученной вакансии, если получены все найденные вакансии работодателя;
+    иначе (сработало ограничение pages_max) отметка не меняется, чтобы не пропустить
+    неполученные вакансии - для таких работодателей нужен обход с делением по датам (SYNC_MODE=crawl).
+    При close_vanished=True вакансии работодателя запрашиваются полностью (без date_from), и вакансии,
+    отсутствующие в ответе, отмечаются закрытыми. Закрытие выполняется, только если получены
+    все найденные вакансии работодателя (не сработало ограничение pages_max).
+    Возвращает словарь {название работодателя: {"found", "loaded", "closed"}}.
+    """
+    parsers = {}
+    for employer in employers:
+        params = {"page": 0, "per_page": PER_PAGE}
+        last_published_at = None if close_vanished else db.get_sync_state(employer['id'])
+        if last_published_at:
+            params['date_from'] = last_published_at.isoformat()
+        parsers[HH(employer['vacancies_url'], params, session, cache=cache)] = employer
+
+    found = {parser: 0 for parser in parsers}
+    seen = {parser: set() for parser in parsers}
+    latest = {parser: None for parser in parsers}
+
+    def items():
+        for parser, data in iter_pages_concurrently(list(parsers), pages_max, max_workers):
+            found[parser] = data['found']
+            for item in data['items']:
+                seen[parser].add(item['id'])
+                published_at = parse_published_at(item['published_at'])
+                if latest[parser] is None or published_at > latest[parser]:
+                    latest[parser] = published_at
+                yield item
+
+    db.insert_data('vacancies', items(), load_mode='upsert')
+
+    result = {}
+    for parser, employer in parsers.items():
+        complete = len(seen[parser]) >= found[parser]
+        if complete:
+            db.set_sync_state(employer['id'], latest[parser])
+        else:
+            print(f"Работодатель {employer['name']}: получено {len(seen[parser])} из {found[parser]} вакансий, "
+                  f"отметка синхронизации не изменена")
+        closed = 0
+        if close_vanished and complete:
+            closed = db.close_vanished_vacancies(employer['id'], seen[parser])
+        result[employer['name']] = {"found": found[parser], "loaded": len(seen[parser]), "closed": closed}
+    return result
@@ -0,0 +1,61 @@
+"""
+Тесты деления запросов обхода по окну дат публикации (split_task). PostgreSQL не нужен.
+"""
+from datetime import datetime, timedelta, timezone
+
+from src.crawler import MIN_WINDOW, format_date, split_task
+from src.sync import parse_published_at
+
+NOW = datetime(2024, 12, 31, 12, 0, 0, tzinfo=timezone.utc)
+SECOND = timedelta(seconds=1)
+
+
+def split_all(params: dict, depth: int) -> list[dict]:
+    """Делит запрос и полученные запросы depth раз подряд и возвращает итоговые запросы."""
+    tasks = [params]
+    for _ in range(depth):
+        tasks = [child for task in tasks for child in (split_task(task, NOW, period_days=30) or [task])]
+    return tasks
+
+
+def assert_windows_cover(tasks: list[dict], date_from: datetime | None, date_to: datetime):
+    """Окна запросов tasks без пропусков и пересечений (с точностью до секунды) покрывают [date_from, date_to]."""
+    windows = sorted(((parse_published_at(task['date_from']) if 'date_from' in task else None,
+                       parse_published_at(task['date_to'])) for task in tasks), key=lambda window: window[1])
+    assert windows[0][0] == date_from
+    assert all(window[0] is not None for window in windows[1:])
+    for (_, previous_to), (next_from, _) in zip(windows, windows[1:]):
+        assert next_from == previous_to + SECOND
+    assert windows[-1][1] == date_to
+
+
+def test_open_ended_task_keeps_older_vacancies():
+    children = split_task({'employer_id': '1'}, NOW, period_days=30)
+    assert len(children) == 3
+    assert all(child['employer_id'] == '1' for child in children)
+    # последний запрос - вакансии старше периода, он тоже без начала окна
+    assert 'date_from' not in children[-1]
+    assert children[0]['date_from'] == format_date(NOW - timedelta(days=30))
+    assert_windows_cover(children, None, NOW)
+
+
+def test_repeated_splits_leave_no_gaps():
+    tasks = split_all({'employer_id': '1'}, depth=5)
+    assert len(tasks) > 10
+    assert_windows_cover(tasks, None, NOW)
+
+
+def test_bounded_window_splits_in_two():
+    date_from = datetime(2024, 6, 1, tzinfo=timezone.utc)
+    date_to = datetime(2024, 6, 2, 0, 0, 1, tzinfo=timezone.utc)
+    params = {'employer_id': '1', 'date_from': format_date(date_from), 'date_to': format_date(date_to)}
+    children = split_task(params, NOW)
+    assert len(children) == 2
+    assert_windows_cover(children, date_from, date_to)
+    assert_windows_cover(split_all(params, depth=4), date_from, date_to)
+
+
+def test_small_window_is_not_split():
+    date_from = datetime(2024, 6, 1, tzinfo=timezone.utc)
+    params = {'date_from': format_date(date_from), 'date_to': format_date(date_from + 2 * MIN_WINDOW - SECOND)}
+    assert split_task(params, NOW) is None
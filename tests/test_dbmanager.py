@@ -0,0 +1,162 @@
+"""
+Тесты DBManager на синтетических данных benchmarks.generator.
+Нужен доступ к PostgreSQL: параметры берутся из переменных окружения POSTGRES_* (как в .env),
+используется отдельная БД POSTGRES_TEST_DB (по умолчанию curs5_test), ее таблицы очищаются.
+Без POSTGRES_HOST и POSTGRES_USER тесты, использующие БД (фикстура db), пропускаются.
+"""
+import os
+
+import pytest
+
+from benchmarks.generator import generate_all_vacancies, generate_employers, generate_vacancies, generate_vacancy
+from src.dbmanager import DBManager, ROLES_TABLE, VACANCIES_SQL, positional_params
+
+EMPLOYERS = 5
+VACANCIES_PER_EMPLOYER = 400
+
+
+@pytest.fixture(scope='module')
+def db():
+    if not (os.getenv('POSTGRES_HOST') and os.getenv('POSTGRES_USER')):
+        pytest.skip("не заданы параметры PostgreSQL (POSTGRES_HOST, POSTGRES_USER)")
+    params = {
+        'user': os.getenv('POSTGRES_USER'),
+        'password': os.getenv('POSTGRES_PASSWORD'),
+        'host': os.getenv('POSTGRES_HOST'),
+        'port': os.getenv('POSTGRES_PORT'),
+        'dbname': os.getenv('POSTGRES_TEST_DB', 'curs5_test'),
+    }
+    db = DBManager(params)
+    with db.connection() as conn, conn.cursor() as cur:
+        cur.execute("TRUNCATE vacancies, vacancy_professional_roles, employers, sync_state RESTART IDENTITY CASCADE")
+    db.insert_data('employers', generate_employers(EMPLOYERS, VACANCIES_PER_EMPLOYER))
+    db.insert_data('vacancies', generate_all_vacancies(EMPLOYERS, VACANCIES_PER_EMPLOYER))
+    yield db
+    db.close_conn()
+
+
+@pytest.mark.parametrize("query, expected", [
+    ("SELECT 1", "SELECT 1"),
+    ("SELECT * FROM t WHERE a = %s AND b = %s", "SELECT * FROM t WHERE a = $1 AND b = $2"),
+    ("SELECT * FROM t WHERE name LIKE '%%x%%' AND a = %s::int",
+     "SELECT * FROM t WHERE name LIKE '%x%' AND a = $1::int"),
+    ("VALUES (%s, %%s, %s)", "VALUES ($1, %s, $2)"),
+])
+def test_positional_params(query, expected):
+    assert positional_params(query) == expected
+
+
+def reference_vacancies_with_higher_salary(db: DBManager) -> tuple[list[dict], list[tuple]]:
+    """
+    Прежняя реализация get_vacancies_with_higher_salary: группы (currency, gross) вакансий с зарплатой,
+    затем отдельный запрос вакансий каждой группы со сравнением со средними по группе.
+    Группы с gross NULL сравнивались как gross = null и в результат не попадали.
+    Возвращает результат и список групп.
+    """
+    group = f"FROM {VACANCIES_SQL} WHERE currency = %(currency)s AND gross = %(gross)s"
+    data_dict = []
+    with db.connection() as conn, conn.cursor() as cur:
+        cur.execute(f"SELECT currency, gross FROM {VACANCIES_SQL} "
+                    f"WHERE salary_from IS NOT NULL OR salary_to IS NOT NULL "
+                    f"GROUP BY currency, gross")
+        groups = cur.fetchall()
+        for currency, gross in groups:
+            cur.execute(f"SELECT vacancies_id, name, salary_from, salary_to, currency, gross FROM {VACANCIES_SQL} "
+                        f"WHERE (salary_from >= (SELECT AVG(salary_from) {group}) "
+                        f"OR (SELECT AVG(salary_from) {group}) IS NULL) "
+                        f"AND (salary_to >= (SELECT AVG(salary_to) {group}) "
+                        f"OR (SELECT AVG(salary_to) {group}) IS NULL) "
+                        f"AND currency = %(currency)s AND gross = %(gross)s",
+                        {'currency': currency, 'gross': gross})
+            data_dict.extend({"vacancies_id": d[0], "vacancies_name": d[1], "salary_from": d[2],
+                              "salary_to": d[3], "currency": d[4], "gross": d[5]} for d in cur.fetchall())
+    return data_dict, groups
+
+
+def test_vacancies_with_higher_salary_matches_per_group_queries(db):
+    expected, groups = reference_vacancies_with_higher_salary(db)
+    result = db.get_vacancies_with_higher_salary()
+
+    # в данных есть группы с gross = True и с gross NULL (False сохраняется как NULL)
+    assert {gross for _, gross in groups} == {True, None}
+    assert result
+    assert result == sorted(expected, key=lambda item: (item["currency"], item["vacancies_id"]))
+    assert all(item["gross"] is True for item in result)
+
+
+def row_counters(db: DBManager) -> tuple:
+    """Счетчики вставленных и пропущенных строк vacancies."""
+    counters = {counter["name"]: counter["value"] for counter in db.metrics.snapshot()["counters"]
+                if counter["labels"] == {"table": "vacancies"}}
+    return counters.get("db_rows_inserted_total", 0), counters.get("db_rows_skipped_total", 0)
+
+
+def test_row_mode_skips_unknown_employer_without_rollback(db):
+    new = list(generate_vacancies(0, VACANCIES_PER_EMPLOYER + 3, start=VACANCIES_PER_EMPLOYER))
+    orphan = generate_vacancy(EMPLOYERS, 0)  # работодатель не загружен в employers
+    ids = [int(item["id"]) for item in (*new, orphan)]
+    inserted, skipped = row_counters(db)
+    try:
+        db.insert_data('vacancies', [new[0], orphan, new[1], new[0], new[2]], load_mode='row', refresh=False)
+        with db.connection() as conn, conn.cursor() as cur:
+            cur.execute("SELECT vacancy_hh_id FROM vacancies WHERE vacancy_hh_id = ANY(%s) ORDER BY 1", (ids,))
+            assert [row[0] for row in cur.fetchall()] == ids[:3]
+            cur.execute("SELECT DISTINCT vacancy_hh_id FROM vacancy_professional_roles "
+                        "WHERE vacancy_hh_id = ANY(%s) ORDER BY 1", (ids,))
+            assert [row[0] for row in cur.fetchall()] == ids[:3]
+        assert row_counters(db) == (inserted + 3, skipped + 2)
+    finally:
+        with db.connection() as conn, conn.cursor() as cur:
+            cur.execute("DELETE FROM vacancy_professional_roles WHERE vacancy_hh_id = ANY(%s)", (ids,))
+            cur.execute("DELETE FROM vacancies WHERE vacancy_hh_id = ANY(%s)", (ids,))
+
+
+def search_urls(db: DBManager, keyword, **kwargs) -> list[str]:
+    return [item["vacancies_alternate_url"] for item in db.get_vacancies_with_keyword(keyword, **kwargs)]
+
+
+def test_keyword_search_matches_words_case_insensitively(db):
+    result = search_urls(db, 'водитель')
+    assert result
+    # слово есть в названии или в одной из профессиональных ролей вакансии
+    with db.connection() as conn, conn.cursor() as cur:
+        cur.execute(f"SELECT alternate_url FROM vacancies WHERE name ILIKE '%%водитель%%' "
+                    f"OR EXISTS (SELECT 1 FROM vacancy_professional_roles "
+                    f"JOIN {ROLES_TABLE} ON {ROLES_TABLE}.id = vacancy_professional_roles.role_id "
+                    f"WHERE vacancy_professional_roles.vacancy_hh_id = vacancies.vacancy_hh_id "
+                    f"AND {ROLES_TABLE}.name ILIKE '%%водитель%%')")
+        assert sorted(result) == sorted(row[0] for row in cur.fetchall())
+    assert search_urls(db, 'ВОДИТЕЛЬ') == result
+    # словоформы сводятся к одной основе
+    assert search_urls(db, 'водители') == result
+
+
+def test_keyword_search_ranks_name_matches_first(db):
+    result = db.get_vacancies_with_keyword('водитель')
+    in_name = ['водитель' in item['vacancies_name'].lower() for item in result]
+    assert any(in_name) and not all(in_name)
+    # совпадение в названии весит больше, чем только в профессиональной роли
+    assert in_name == sorted(in_name, reverse=True)
+
+
+def test_keyword_search_with_several_words(db):
+    drivers = set(search_urls(db, 'водитель'))
+    developers = set(search_urls(db, 'python'))
+    assert drivers and developers
+    result = search_urls(db, ['водитель', 'python'])
+    assert len(result) == len(set(result))
+    assert set(result) == drivers | developers
+
+
+def test_keyword_search_pages(db):
+    result = search_urls(db, ['водитель', 'python'])
+    pages = [search_urls(db, ['водитель', 'python'], limit=50, offset=offset)
+             for offset in range(0, len(result) + 50, 50)]
+    assert all(len(page) == 50 for page in pages[:-2])
+    assert [url for page in pages for url in page] == result
+    assert pages[-1] == []
+
+
+def test_keyword_search_requires_words(db):
+    with pytest.raises(ValueError):
+        db.get_vacancies_with_keyword([])
@@ -0,0 +1,120 @@
+"""
+Тесты ResponseCache: срок свежести, вытеснение давно не использованных ответов, условные запросы
+к заглушке API hh.ru (benchmarks.stub_server) и режим offline. PostgreSQL не нужен.
+"""
+import pytest
+
+from benchmarks.stub_server import StubServer
+from src.http_cache import ResponseCache
+from src.metrics import Metrics
+from src.my_exeption import RequestErrorException
+from src.parser import HH
+
+URL = 'https://api.hh.ru/vacancies'
+
+
+class Clock:
+    """Подменяет time.time() в src.http_cache, время сдвигается вручную."""
+
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch) -> Clock:
+    clock = Clock()
+    monkeypatch.setattr('src.http_cache.time.time', clock)
+    return clock
+
+
+@pytest.fixture
+def cache_path(tmp_path) -> str:
+    return str(tmp_path / 'cache.sqlite3')
+
+
+def test_entry_is_fresh_within_ttl(clock, cache_path):
+    cache = ResponseCache(cache_path, ttl=60)
+    assert cache.get(URL, {'page': 0}) is None
+    cache.put(URL, {'page': 0}, b'{}', etag='"1"', last_modified='Mon, 01 Jan 2024 00:00:00 GMT')
+
+    clock.now += 59
+    entry = cache.get(URL, {'page': 0})
+    assert entry.fresh
+    assert (entry.body, entry.etag, entry.last_modified) == (b'{}', '"1"', 'Mon, 01 Jan 2024 00:00:00 GMT')
+
+    clock.now += 1
+    assert not cache.get(URL, {'page': 0}).fresh
+
+    cache.refresh(entry)
+    assert cache.get(URL, {'page': 0}).fresh
+    cache.close()
+
+
+def test_key_does_not_depend_on_params_order(cache_path):
+    cache = ResponseCache(cache_path)
+    cache.put(URL, {'page': 1, 'per_page': 100}, b'{}')
+    assert cache.get(URL, {'per_page': 100, 'page': 1}) is not None
+    assert cache.get(URL, {'page': 2, 'per_page': 100}) is None
+    cache.close()
+
+
+def test_evicts_least_recently_used(clock, cache_path):
+    cache = ResponseCache(cache_path, max_entries=2)
+    for page in range(2):
+        clock.now += 1
+        cache.put(URL, {'page': page}, b'{}')
+    clock.now += 1
+    cache.get(URL, {'page': 0})
+    clock.now += 1
+    cache.put(URL, {'page': 2}, b'{}')
+
+    assert cache.get(URL, {'page': 0}) is not None
+    assert cache.get(URL, {'page': 1}) is None
+    assert cache.get(URL, {'page': 2}) is not None
+    assert cache.stats()['stored'] == 3
+    assert cache.stats()['evicted'] == 1
+    cache.close()
+
+
+def test_stale_entry_revalidated_with_etag(cache_path):
+    with StubServer(1, 50) as server:
+        params = {"page": 0, "per_page": 20}
+        cache = ResponseCache(cache_path, ttl=0)
+        first = HH(server.vacancies_url, dict(params), cache=cache, metrics=Metrics())._get_page(0)
+        second = HH(server.vacancies_url, dict(params), cache=cache, metrics=Metrics())._get_page(0)
+        assert server.requests_count == 2
+        assert server.not_modified_count == 1
+    assert second == first
+    assert cache.stats() == {"hits": 0, "misses": 2, "revalidated": 1, "stored": 1, "evicted": 0}
+    cache.close()
+
+
+def test_fresh_entry_served_without_request(cache_path):
+    with StubServer(1, 50) as server:
+        cache = ResponseCache(cache_path)
+        first = HH(server.vacancies_url, {"page": 0, "per_page": 20}, cache=cache, metrics=Metrics())._get_page(0)
+        second = HH(server.vacancies_url, {"page": 0, "per_page": 20}, cache=cache, metrics=Metrics())._get_page(0)
+        assert server.requests_count == 1
+    assert second == first
+    assert cache.stats()["hits"] == 1
+    cache.close()
+
+
+def test_offline_mode_uses_only_stored_responses(clock, cache_path):
+    with StubServer(1, 50) as server:
+        cache = ResponseCache(cache_path, ttl=60)
+        online = HH(server.vacancies_url, {"page": 0, "per_page": 20}, cache=cache, metrics=Metrics())._get_page(0)
+        cache.close()
+
+        clock.now += 3600
+        cache = ResponseCache(cache_path, ttl=60, offline=True)
+        parser = HH(server.vacancies_url, {"page": 0, "per_page": 20}, cache=cache, metrics=Metrics())
+        # устаревший ответ используется без обращения к API
+        assert parser._get_page(0) == online
+        with pytest.raises(RequestErrorException):
+            parser._get_page(1)
+        assert server.requests_count == 1
+    cache.close()
@@ -0,0 +1,60 @@
+"""
+Тесты Metrics: накопление счетчиков и таймеров, выгрузка в JSON и формат Prometheus.
+PostgreSQL не нужен.
+"""
+import json
+
+from src.metrics import Metrics
+
+
+def test_counters_and_timers():
+    metrics = Metrics()
+    metrics.inc('http_requests_total', endpoint='vacancies', status=200)
+    metrics.inc('http_requests_total', 2, endpoint='vacancies', status=200)
+    metrics.observe('http_request_seconds', 0.5, endpoint='vacancies')
+    metrics.observe('http_request_seconds', 1.5, endpoint='vacancies')
+
+    snapshot = metrics.snapshot()
+    assert snapshot['counters'] == [{'name': 'http_requests_total',
+                                     'labels': {'endpoint': 'vacancies', 'status': '200'}, 'value': 3}]
+    assert snapshot['timers'] == [{'name': 'http_request_seconds', 'labels': {'endpoint': 'vacancies'},
+                                   'count': 2, 'sum_seconds': 2.0, 'max_seconds': 1.5, 'avg_seconds': 1.0}]
+
+
+def test_export_with_mixed_label_types():
+    """Метки status=200 и status='error' одного счетчика не ломают сортировку при выгрузке."""
+    metrics = Metrics()
+    metrics.inc('http_requests_total', endpoint='vacancies', status='error')
+    metrics.inc('http_requests_total', endpoint='vacancies', status=200)
+
+    counters = json.loads(metrics.to_json())['counters']
+    assert [counter['labels']['status'] for counter in counters] == ['200', 'error']
+    assert metrics.to_prometheus() == (
+        '# TYPE http_requests_total counter\n'
+        'http_requests_total{endpoint="vacancies",status="200"} 1\n'
+        'http_requests_total{endpoint="vacancies",status="error"} 1\n'
+    )
+
+
+def test_prometheus_timers_and_escaping():
+    metrics = Metrics()
+    metrics.observe('db_statement_seconds', 0.25, statement='SELECT "x"\nFROM t')
+    assert metrics.to_prometheus() == (
+        '# TYPE db_statement_seconds summary\n'
+        'db_statement_seconds_count{statement="SELECT \\"x\\"\\nFROM t"} 1\n'
+        'db_statement_seconds_sum{statement="SELECT \\"x\\"\\nFROM t"} 0.25\n'
+    )
+
+
+def test_callback_and_reset():
+    events = []
+    metrics = Metrics(callback=lambda kind, name, value, labels: events.append((kind, name, value, labels)))
+    metrics.inc('db_rows_inserted_total', 5, table='vacancies')
+    with metrics.timer('db_operation_seconds', operation='insert_data'):
+        pass
+    assert events[0] == ('counter', 'db_rows_inserted_total', 5, {'table': 'vacancies'})
+    assert events[1][:2] == ('timer', 'db_operation_seconds')
+
+    metrics.reset()
+    assert metrics.snapshot() == {'counters': [], 'timers': []}
+    assert metrics.to_prometheus() == '\n'
@@ -0,0 +1,84 @@
+"""
+Тесты загрузки страниц HH на локальной заглушке API hh.ru (benchmarks.stub_server).
+PostgreSQL и доступ к hh.ru не нужны.
+"""
+import pytest
+
+from benchmarks.generator import generate_all_vacancies
+from benchmarks.stub_server import StubServer
+from src.metrics import Metrics
+from src.my_exeption import RequestErrorException
+from src.parser import HH, load_data_concurrently
+
+EMPLOYERS = 2
+VACANCIES_PER_EMPLOYER = 250
+PER_PAGE = 20
+
+
+def vacancies(server: StubServer, **kwargs) -> HH:
+    return HH(server.vacancies_url, {"page": 0, "per_page": PER_PAGE}, metrics=Metrics(), **kwargs)
+
+
+def sleeps(monkeypatch) -> list[float]:
+    """Подменяет паузы между повторами запроса и возвращает список их длительностей."""
+    delays = []
+    monkeypatch.setattr('src.parser.time.sleep', delays.append)
+    return delays
+
+
+def test_retries_after_429_respect_retry_after(monkeypatch):
+    delays = sleeps(monkeypatch)
+    with StubServer(EMPLOYERS, VACANCIES_PER_EMPLOYER, errors_first=2, retry_after=3) as server:
+        parser = vacancies(server, backoff_factor=0.5)
+        data = parser._get_page(0)
+        assert server.requests_count == 3
+    assert len(data["items"]) == PER_PAGE
+    # пауза - большее из экспоненциальной паузы и Retry-After
+    assert delays == [3, 3]
+    counters = {counter["labels"]["status"]: counter["value"] for counter in parser.metrics.snapshot()["counters"]
+                if counter["name"] == "http_requests_total"}
+    assert counters == {"429": 2, "200": 1}
+
+
+def test_retries_use_exponential_backoff(monkeypatch):
+    delays = sleeps(monkeypatch)
+    with StubServer(EMPLOYERS, VACANCIES_PER_EMPLOYER, errors_first=3, retry_after=0) as server:
+        vacancies(server, backoff_factor=0.5)._get_page(0)
+    assert delays == [0.5, 1.0, 2.0]
+
+
+def test_gives_up_after_max_retries(monkeypatch):
+    delays = sleeps(monkeypatch)
+    with StubServer(EMPLOYERS, VACANCIES_PER_EMPLOYER, errors_first=10) as server:
+        with pytest.raises(RequestErrorException):
+            vacancies(server, max_retries=2, backoff_factor=0)._get_page(0)
+        assert server.requests_count == 3
+    assert len(delays) == 2
+
+
+def test_pages_keep_order(monkeypatch):
+    with StubServer(EMPLOYERS, VACANCIES_PER_EMPLOYER, latency=0.01) as server:
+        parsers = [HH(server.vacancies_url, {"page": 0, "per_page": PER_PAGE, "employer_id": employer_id},
+                      metrics=Metrics())
+                   for employer_id in ("1000000", "1000001")]
+        messages = load_data_concurrently(parsers, pages_max=20, max_workers=4)
+    assert messages == [f"По запросу найдено {VACANCIES_PER_EMPLOYER} элементов"] * 2
+    expected = [item["id"] for item in generate_all_vacancies(EMPLOYERS, VACANCIES_PER_EMPLOYER)]
+    assert [item["id"] for parser in parsers for item in parser.data_lst] == expected
+
+
+def test_pages_max_limits_loaded_pages():
+    with StubServer(EMPLOYERS, VACANCIES_PER_EMPLOYER) as server:
+        parser = vacancies(server)
+        parser.load_data_via_api(pages_max=3)
+        assert server.requests_count == 3
+    assert len(parser) == 3 * PER_PAGE
+
+
+@pytest.mark.parametrize("max_workers", [1, 3])
+def test_max_workers_limits_concurrent_requests(max_workers):
+    with StubServer(EMPLOYERS, VACANCIES_PER_EMPLOYER, latency=0.05) as server:
+        parser = vacancies(server)
+        pages = list(parser.iter_pages(pages_max=10, max_workers=max_workers))
+        assert server.max_in_flight == max_workers
+    assert len(pages) == 10